@@ -1,8 +1,35 @@
 # apps/hanif_traders/hanif_traders/api/complain.py
+import base64
+import json
+import re
+
 import frappe
-from frappe.utils import today
+from frappe.utils import today, cint
 from frappe.utils import time_diff_in_hours, now_datetime, get_datetime
-from hanif_traders.api.response import create_response, SUCCESS, UNAUTHORIZED, FORBIDDEN, NOT_FOUND, VALIDATION_ERROR, SERVER_ERROR
+from hanif_traders.api.response import create_response, SUCCESS, UNAUTHORIZED, FORBIDDEN, NOT_FOUND, VALIDATION_ERROR, CONFLICT, SERVER_ERROR
+from hanif_traders.api import complain_cache, complain_sync
+from hanif_traders.api.utils import phone_search_prefix
+
+# Fields the mobile app may request; complain_csc is never selectable.
+COMPLAIN_FIELDS = (
+    "name", "creation", "modified", "docstatus",
+    "complainer_name", "complainer_phone", "complainer_address", "instruction__remarks",
+    "date", "posting_time", "workflow_state", "priority", "territory", "parent_territory",
+    "amended_from", "assigned_to_technician", "technician_phone_no", "status",
+    "resolution_date", "time_to_resolution", "technician_name", "gfc_complain_no",
+    "vehicle_no", "technician_cnic", "closing_remarks",
+)
+MAX_COMPLAIN_PAGE_SIZE = 500
+SEARCH_FIELDS = (
+    "name", "date", "complainer_name", "complainer_phone", "complainer_address",
+    "territory", "workflow_state", "assigned_to_technician", "technician_name",
+)
+# Shorter phone fragments would match most of the table.
+MIN_PHONE_PREFIX = 4
+BULK_ASSIGN_CHUNK_SIZE = 100
+BULK_ASSIGN_EVENT = "complain_bulk_assign_progress"
+
+RESOLUTION_REASONS = {"CSC Verified": "CSC_VERIFIED", "Resolved": "RESOLVED_NO_CSC"}
 
 @frappe.whitelist()
 def verify_csc(complain_name, input_code):
@@ -10,36 +37,15 @@ def verify_csc(complain_name, input_code):
     if not user or user == "Guest":
         return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
 
-    complaint = frappe.get_doc("Complain", complain_name)
-    tech = complaint.assigned_to_technician
-    if not tech:
+    complaint = _get_for_resolution(complain_name)
+    if not complaint.assigned_to_technician:
         frappe.throw("Assigned Technician not set on this Complain")
     if not complaint.complain_csc:
         frappe.throw("CSC code has not been generated yet.")
     if complaint.complain_csc != input_code:
         frappe.throw("Invalid CSC code.")
 
-    # Update state/fields
-    complaint.db_set("workflow_state", "CSC Verified", update_modified=False)
-    complaint.db_set("resolution_date", today(), update_modified=False)
-    
-    # Calculate time to resolution
-    if complaint.date and complaint.posting_time:
-        start_time = get_datetime(f"{complaint.date} {complaint.posting_time}")
-    else:
-        start_time = complaint.creation
-
-    time_taken = round(time_diff_in_hours(now_datetime(), start_time), 2)
-
-    frappe.db.set_value("Complain", complain_name, "time_to_resolution", time_taken, update_modified=False)
-
-    # Process Incentives
-    from hanif_traders.api.technician import process_incentive, update_avg_resolution_time
-    msg = process_incentive(complain_name, "CSC_VERIFIED")
-    
-    # Update Avg Resolution Time
-    update_avg_resolution_time(tech)
-
+    msg = resolve_complain(complaint, "CSC Verified")
     return create_response(message=f"{complain_name} marked 'CSC Verified'. {msg}")
 
 @frappe.whitelist()
@@ -48,69 +54,249 @@ def mark_resolved_without_csc(complain_name):
     if not user or user == "Guest":
         return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
 
-    complaint = frappe.get_doc("Complain", complain_name)
+    complaint = _get_for_resolution(complain_name)
     if not complaint.assigned_to_technician:
         frappe.throw("Assigned Technician not set on this Complain")
 
-    complaint.db_set("workflow_state", "Resolved", update_modified=False)
-    complaint.db_set("resolution_date", today(), update_modified=False)
-
-    # Process Incentives
-    from hanif_traders.api.technician import process_incentive, update_avg_resolution_time
-    msg = process_incentive(complain_name, "RESOLVED_NO_CSC")
-    
-    # Update Avg Resolution Time
-    update_avg_resolution_time(complaint.assigned_to_technician)
-    update_avg_resolution_time(complaint.assigned_to_technician)
+    msg = resolve_complain(complaint, "Resolved")
     return create_response(message=f"Resolved without CSC. {msg}")
 
+def resolve_complain(complaint, state):
+    """
+    Move `complaint` (as read by _get_for_resolution) to `state` ("CSC Verified"
+    or "Resolved") with a single UPDATE, then post incentives and queue the
+    technician's average resolution time. Returns the incentive message.
+    """
+    if complaint.date and complaint.posting_time:
+        start_time = get_datetime(f"{complaint.date} {complaint.posting_time}")
+    else:
+        start_time = complaint.creation
+
+    complaint.update({
+        "workflow_state": state,
+        "resolution_date": today(),
+        "time_to_resolution": round(time_diff_in_hours(now_datetime(), start_time), 2),
+    })
+    frappe.db.sql("""
+        UPDATE `tabComplain`
+        SET workflow_state = %(workflow_state)s, status = %(workflow_state)s,
+            resolution_date = %(resolution_date)s, time_to_resolution = %(time_to_resolution)s
+        WHERE name = %(name)s
+    """, complaint)
+    complain_sync.record_change(complaint.name, [complaint.assigned_to_technician])
+
+    from hanif_traders.api.technician import process_incentive, queue_avg_resolution_time
+    msg = process_incentive(complaint.name, RESOLUTION_REASONS[state], complaint=complaint)
+    queue_avg_resolution_time(complaint.assigned_to_technician)
+    return msg
+
+def _get_for_resolution(complain_name):
+    complaint = frappe.db.get_value(
+        "Complain",
+        complain_name,
+        ["name", "assigned_to_technician", "complain_csc", "date", "posting_time", "creation"],
+        as_dict=True,
+    )
+    if not complaint:
+        frappe.throw(f"Complain {complain_name} not found", frappe.DoesNotExistError)
+    return complaint
+
 @frappe.whitelist()
 def bulk_assign(complain_names, technician):
+    """
+    Queue assignment of Open complaints to `technician`.
+
+    The work runs in `run_bulk_assign`; progress is pushed to the calling
+    user as BULK_ASSIGN_EVENT realtime messages carrying the returned job_id.
+
+    Rows are updated set-based, without a document save, so this only
+    performs the workflow's Open -> Assigned transition: the caller needs a
+    role that transition allows, and complaints in any other state are
+    skipped. The Complain validate rules for that move (a technician is
+    set) hold by construction.
+    """
     user = frappe.session.user
     if not user or user == "Guest":
         return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
 
-    import json
     if isinstance(complain_names, str):
         complain_names = json.loads(complain_names)
     
     if not complain_names or not technician:
         frappe.throw("Complain names and Technician are required.")
 
-    success_count = 0
-    errors = []
+    frappe.has_permission("Complain", "write", throw=True)
+    if not _can_transition("Open", "Assigned", user):
+        return create_response(success=False, code=FORBIDDEN, message="Not permitted to assign complaints")
+    if not frappe.db.exists("Technician", technician):
+        return create_response(success=False, code=NOT_FOUND, message=f"Technician {technician} not found")
 
-    for name in complain_names:
+    complain_names = list(dict.fromkeys(complain_names))
+    job_id = f"complain_bulk_assign::{frappe.generate_hash(length=10)}"
+    frappe.enqueue(
+        "hanif_traders.api.complain.run_bulk_assign",
+        queue="long",
+        job_id=job_id,
+        enqueue_after_commit=True,
+        complain_names=complain_names,
+        technician=technician,
+        user=user,
+        progress_id=job_id,
+    )
+    return create_response(
+        message=f"Assigning {len(complain_names)} complaints in the background.",
+        data={"job_id": job_id, "total": len(complain_names)},
+    )
+
+def _can_transition(state, next_state, user):
+    """
+    Whether `user` holds a role the active Complain workflow allows for
+    `state` -> `next_state`. Without an active workflow only permissions apply.
+    """
+    from frappe.model.workflow import get_workflow_name
+
+    workflow = get_workflow_name("Complain")
+    if not workflow:
+        return True
+
+    allowed = frappe.get_all(
+        "Workflow Transition",
+        filters={"parent": workflow, "state": state, "next_state": next_state},
+        pluck="allowed",
+    )
+    return bool(set(allowed) & set(frappe.get_roles(user)))
+
+def run_bulk_assign(complain_names, technician, user, progress_id=None):
+    """
+    Background job: assign Open complaints chunk by chunk with set-based
+    updates, then queue CSC generation and SMS for each chunk.
+    """
+    tech = frappe.db.get_value(
+        "Technician", technician, ["technician_name", "phone_number", "vehicle_number", "cnic"], as_dict=True
+    )
+    progress = {"job_id": progress_id, "total": len(complain_names), "done": 0, "assigned": 0, "skipped": 0, "failed": 0}
+
+    for i in range(0, len(complain_names), BULK_ASSIGN_CHUNK_SIZE):
+        chunk = complain_names[i:i + BULK_ASSIGN_CHUNK_SIZE]
         try:
-            doc = frappe.get_doc("Complain", name)
-            if doc.workflow_state == "Open":
-                doc.assigned_to_technician = technician
-                doc.workflow_state = "Assigned"
-                doc.save() # This will trigger on_update and send SMS
-                success_count += 1
-        except Exception as e:
-            frappe.log_error(title=f"Bulk Assign Error: {name}", message=frappe.get_traceback())
-            errors.append(f"{name}: {str(e)}")
-    
-    msg = f"{success_count} complaints assigned."
-    if errors:
-        msg += f" {len(errors)} failed (check Error Log)."
-    
-    msg = f"{success_count} complaints assigned."
-    if errors:
-        msg += f" {len(errors)} failed (check Error Log)."
-    
-    return create_response(message=msg)
+            assigned = _assign_chunk(chunk, technician, tech, user)
+            frappe.db.commit()
+            if assigned:
+                frappe.enqueue(
+                    "hanif_traders.api.complain.send_assignment_notifications",
+                    queue="default",
+                    complain_names=assigned,
+                )
+            progress["assigned"] += len(assigned)
+            progress["skipped"] += len(chunk) - len(assigned)
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(title="Bulk Assign Error", message=frappe.get_traceback())
+            progress["failed"] += len(chunk)
+
+        progress["done"] += len(chunk)
+        frappe.publish_realtime(BULK_ASSIGN_EVENT, progress, user=user)
+
+    progress["finished"] = True
+    frappe.publish_realtime(BULK_ASSIGN_EVENT, progress, user=user)
+    return progress
+
+def _assign_chunk(names, technician, tech, user):
+    """
+    Assign the still-Open complaints among `names`; returns the names assigned.
+    """
+    # Lock the rows so a concurrent assignment cannot take the same complaint.
+    open_names = frappe.db.sql_list("""
+        SELECT name FROM `tabComplain`
+        WHERE name IN %(names)s AND workflow_state = 'Open' AND docstatus = 0
+        FOR UPDATE
+    """, {"names": tuple(names)})
+    if not open_names:
+        return []
+
+    now = now_datetime()
+    frappe.db.sql("""
+        UPDATE `tabComplain`
+        SET assigned_to_technician = %(technician)s, workflow_state = 'Assigned', status = 'Assigned',
+            technician_name = %(technician_name)s, technician_phone_no = %(phone_number)s,
+            vehicle_no = %(vehicle_number)s, technician_cnic = %(cnic)s,
+            modified = %(now)s, modified_by = %(user)s
+        WHERE name IN %(names)s
+    """, {**tech, "technician": technician, "now": now, "user": user, "names": tuple(open_names)})
+
+    # Saves are skipped, so leave the audit trail a save would have.
+    frappe.db.bulk_insert(
+        "Comment",
+        ["name", "creation", "modified", "owner", "modified_by", "comment_type", "reference_doctype", "reference_name", "comment_email", "content"],
+        [
+            (frappe.generate_hash(length=10), now, now, user, user, "Info", "Complain", name, user,
+             f"Assigned to <b>{tech.technician_name or technician}</b> by bulk assignment")
+            for name in open_names
+        ],
+    )
+    complain_sync.record_changes(open_names, [technician], pool=True)
+    return open_names
+
+def send_assignment_notifications(complain_names):
+    """
+    Background job: generate CSCs and queue the Assigned SMS for bulk-assigned complaints.
+    """
+    complaints = frappe.get_all(
+        "Complain",
+        filters={"name": ["in", complain_names], "workflow_state": "Assigned"},
+        fields=["*"],
+    )
+    if not complaints:
+        return
+
+    codes = {c.name: generate_csc(c.name, c.modified) for c in complaints}
+    frappe.db.sql(f"""
+        UPDATE `tabComplain`
+        SET complain_csc = CASE name {" ".join(["WHEN %s THEN %s"] * len(codes))} END
+        WHERE name IN %s
+    """, [*(value for item in codes.items() for value in item), tuple(codes)])
+    frappe.db.commit()
+
+    settings = frappe.get_cached_doc("Complain Settings")
+    if not settings.sms_enabled or not settings.assigned_sms_template:
+        return
+
+    test_technicians = set(frappe.get_all(
+        "Technician",
+        filters={"name": ["in", list({c.assigned_to_technician for c in complaints})], "is_test_account": 1},
+        pluck="name",
+    ))
+    from hanif_traders.api.sms_queue import queue_messages
+
+    messages = []
+    for complaint in complaints:
+        if not complaint.complainer_phone or complaint.assigned_to_technician in test_technicians:
+            continue
+        msg = frappe.render_template(settings.assigned_sms_template, {"doc": complaint, "csc_code": codes[complaint.name]})
+        messages.append((complaint.complainer_phone.replace("+92-", "0"), msg, "Complain", complaint.name))
+    queue_messages(messages)
+
+def generate_csc(complain_name, modified):
+    """
+    Customer Satisfaction Code sent with the Assigned SMS.
+    """
+    return str(abs(hash(complain_name + str(modified))) % 9000 + 1000)
 
 @frappe.whitelist()
-def get_complains(status=None):
+def get_complains(status=None, fields=None, cursor=None, limit=None):
+    """
+    Complaints visible to the calling technician, newest first.
+
+    Results are paged with a keyset cursor: pass `meta.next_cursor` back as
+    `cursor` until it is empty. `limit` defaults to the Complain Settings
+    page size. `fields` (JSON list or comma separated) picks columns from
+    COMPLAIN_FIELDS; all of them by default.
+    """
     user = frappe.session.user
     if not user or user == "Guest":
         return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
     
-    employee = frappe.db.get_value("Employee", {"user_id": user}, "name")
-    technician = frappe.db.get_value("Technician", {"employee_id": employee}, "name")
-    is_test = technician and frappe.db.get_value("Technician", technician, "is_test_account")
+    technician, is_test = _resolve_technician(user)
 
     filters = {}
 
@@ -125,42 +311,243 @@ def get_complains(status=None):
         else:
             filters["workflow_state"] = status
 
+    if isinstance(fields, str):
+        try:
+            fields = json.loads(fields) if fields.startswith("[") else fields.split(",")
+        except ValueError:
+            return create_response(success=False, code=VALIDATION_ERROR, message="fields must be a JSON list or comma separated")
+    if not all(isinstance(f, str) for f in fields or ()):
+        return create_response(success=False, code=VALIDATION_ERROR, message="fields must be a list of field names")
+    fields = [f.strip() for f in fields] if fields else list(COMPLAIN_FIELDS)
+
+    unknown = set(fields) - set(COMPLAIN_FIELDS)
+    if unknown:
+        return create_response(success=False, code=VALIDATION_ERROR, message=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    limit = cint(limit) or cint(frappe.get_cached_doc("Complain Settings").complain_page_size) or 50
+    limit = min(limit, MAX_COMPLAIN_PAGE_SIZE)
+
+    filters = [["Complain", key, *(value if isinstance(value, list) else ["=", value])] for key, value in filters.items()]
+    or_filters = None
+    if cursor:
+        after = _decode_cursor(cursor)
+        if not after:
+            return create_response(success=False, code=VALIDATION_ERROR, message="Invalid cursor")
+        # (creation, name) < cursor, in descending order
+        filters.append(["Complain", "creation", "<=", after[0]])
+        or_filters = [["Complain", "creation", "<", after[0]], ["Complain", "name", "<", after[1]]]
+
+    # The cursor keys are always read, and dropped again if not requested.
     complains = frappe.get_all(
         "Complain",
         filters=filters,
-        fields=["*"]
+        or_filters=or_filters,
+        fields=list(dict.fromkeys([*fields, "creation", "name"])),
+        order_by="creation desc, name desc",
+        limit=limit + 1,
     )
 
+    next_cursor = None
+    if len(complains) > limit:
+        complains = complains[:limit]
+        next_cursor = _encode_cursor(complains[-1])
+
+    extra = {"creation", "name"} - set(fields)
     for complain in complains:
-        if "complain_csc" in complain:
-            del complain["complain_csc"]
-            
-    return create_response(data=complains)
+        for key in extra:
+            complain.pop(key, None)
+
+    return create_response(data=complains, meta={"count": len(complains), "next_cursor": next_cursor})
 
 @frappe.whitelist()
-def get_complain_count(status=None):
+def sync_complains(since_token=None):
+    """
+    Complaints that changed for the calling technician since `since_token`.
+
+    `data.upserts` holds the current rows (same columns as get_complains)
+    and `data.tombstones` the names that were reassigned away, left the
+    Open pool or were deleted. Pass `meta.token` back on the next call and
+    repeat while `meta.has_more`. Without a token every visible complaint is
+    returned (`meta.full`). An expired token answers CONFLICT, after which
+    the app should sync again without one.
+    """
     user = frappe.session.user
     if not user or user == "Guest":
         return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
-    
-    employee = frappe.db.get_value("Employee", {"user_id": user}, "name")
-    technician = frappe.db.get_value("Technician", {"employee_id": employee}, "name")
-    is_test = technician and frappe.db.get_value("Technician", technician, "is_test_account")
 
-    filters = {}
+    technician, is_test = _resolve_technician(user)
+    if not technician:
+        return create_response(success=False, code=FORBIDDEN, message="No technician is linked to this user")
 
-    if status != "Open" or is_test:
-        filters["assigned_to_technician"] = technician
+    # Read before the data so changes made meanwhile are sent again, not lost.
+    # It trails the newest rows slightly; see complain_sync.SAFETY_LAG_SECONDS.
+    latest = complain_sync.get_latest_token()
 
-    if status:
-        if isinstance(status, list):
-            filters["workflow_state"] = ["in", status]
-        else:
-            filters["workflow_state"] = status
+    if not since_token:
+        # Same scoping as get_complains: sandbox technicians never see the Open pool.
+        or_filters = [["assigned_to_technician", "=", technician]]
+        if not is_test:
+            or_filters.append(["workflow_state", "=", "Open"])
+        rows = frappe.get_all("Complain", or_filters=or_filters, fields=list(COMPLAIN_FIELDS))
+        return create_response(
+            data={"upserts": rows, "tombstones": []},
+            meta={"token": str(latest), "full": True, "has_more": False},
+        )
+
+    since = cint(since_token)
+    if since < complain_sync.get_purged_upto():
+        return create_response(success=False, code=CONFLICT, message="Sync token expired. Sync again without a token.")
+
+    names, token, has_more = complain_sync.get_changes(technician, since, include_pool=not is_test, upto=latest)
+    rows = frappe.get_all("Complain", filters={"name": ["in", names]}, fields=list(COMPLAIN_FIELDS)) if names else []
+
+    upserts = [row for row in rows if _is_visible(row, technician, is_test)]
+    visible = {row.name for row in upserts}
+    tombstones = [name for name in names if name not in visible]
+
+    return create_response(
+        data={"upserts": upserts, "tombstones": tombstones},
+        meta={"token": str(token if has_more else max(token, latest)), "full": False, "has_more": has_more},
+    )
 
-    count = frappe.db.count("Complain", filters=filters)
+def _is_visible(row, technician, is_test):
+    return row.assigned_to_technician == technician or (row.workflow_state == "Open" and not is_test)
+
+def _resolve_technician(user):
+    return complain_cache.get_user_technician(user)
+
+def _encode_cursor(row):
+    raw = f"{row.creation}|{row.name}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        creation, name = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return get_datetime(creation), name
+    except Exception:
+        return None
+
+@frappe.whitelist()
+def get_complain_count(status=None, states=None):
+    """
+    Number of complaints visible to the calling technician.
+
+    `status` (one state or a list) returns a single total, as before.
+    `states` (JSON list) returns {state: count} for every state in one call.
+    Counts are served from the cache (see api/complain_cache.py).
+    """
+    user = frappe.session.user
+    if not user or user == "Guest":
+        return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
+    
+    technician, is_test = _resolve_technician(user)
+
+    if isinstance(states, str):
+        try:
+            states = json.loads(states) if states.startswith("[") else states.split(",")
+        except ValueError:
+            return create_response(success=False, code=VALIDATION_ERROR, message="states must be a JSON list or comma separated")
+    if not all(isinstance(state, str) for state in states or ()):
+        return create_response(success=False, code=VALIDATION_ERROR, message="states must be a list of workflow states")
+    if states:
+        counts = {state.strip(): _count_for_state(technician, is_test, state.strip()) for state in states}
+        return create_response(data=counts, meta={"count": sum(counts.values())})
+
+    if isinstance(status, list):
+        # A list of states has always been scoped to the technician's own complaints.
+        count = sum(_count_for_state(technician, True, state) for state in status)
+    else:
+        count = _count_for_state(technician, is_test, status)
     return create_response(data=count, meta={"count": count})
 
+def _count_for_state(technician, is_test, state=None):
+    # Sandbox technicians never see the global Open pool, as in get_complains.
+    if state == "Open" and not is_test:
+        return complain_cache.get_open_pool_count()
+    if not technician:
+        filters = {"assigned_to_technician": None}
+        if state:
+            filters["workflow_state"] = state
+        return frappe.db.count("Complain", filters=filters)
+
+    counts = complain_cache.get_state_counts(technician)
+    return counts.get(state, 0) if state else sum(counts.values())
+
+
+@frappe.whitelist()
+def search_complains(query=None, phone=None, territory=None, start=0, limit=None):
+    """
+    Call-center lookup by customer name/address words, phone fragment and territory.
+
+    `query` is matched against the full-text index on complainer_name and
+    complainer_address (every word must match, as a prefix) and results are
+    ranked by relevance, then newest first. `phone` matches the start of the
+    normalized number, in any format ("+92-300-12", "030012"). `territory`
+    includes its child territories. Paged with `start`; repeat with
+    `meta.next_start` while it is set.
+    """
+    user = frappe.session.user
+    if not user or user == "Guest":
+        return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
+
+    if not frappe.has_permission("Complain", "read"):
+        return create_response(success=False, code=FORBIDDEN, message="Not permitted to search complaints")
+
+    conditions = ["docstatus < 2"]
+    values = {}
+    score = "0"
+
+    if phone:
+        prefix = phone_search_prefix(phone)
+        if len(prefix) < MIN_PHONE_PREFIX:
+            return create_response(success=False, code=VALIDATION_ERROR, message=f"Enter at least {MIN_PHONE_PREFIX} digits of the phone number")
+        conditions.append("complainer_phone_normalized LIKE %(phone_prefix)s")
+        values["phone_prefix"] = prefix + "%"
+
+    if query:
+        terms = _fulltext_terms(query)
+        if not terms:
+            return create_response(success=False, code=VALIDATION_ERROR, message="Search text has no searchable words")
+        score = "MATCH(complainer_name, complainer_address) AGAINST (%(terms)s IN BOOLEAN MODE)"
+        conditions.append(score)
+        values["terms"] = terms
+
+    if territory:
+        bounds = frappe.db.get_value("Territory", territory, ["lft", "rgt"], as_dict=True)
+        if not bounds:
+            return create_response(success=False, code=NOT_FOUND, message=f"Territory {territory} not found")
+        conditions.append("territory IN (SELECT name FROM `tabTerritory` WHERE lft >= %(lft)s AND rgt <= %(rgt)s)")
+        values.update(bounds)
+
+    if not values:
+        return create_response(success=False, code=VALIDATION_ERROR, message="Provide search text, a phone number or a territory")
+
+    start = max(cint(start), 0)
+    limit = cint(limit) or cint(frappe.get_cached_doc("Complain Settings").complain_page_size) or 50
+    limit = min(limit, MAX_COMPLAIN_PAGE_SIZE)
+
+    # User Permissions and permission query conditions, as get_list would apply them.
+    from frappe.desk.reportview import get_match_cond
+
+    rows = frappe.db.sql(f"""
+        SELECT {", ".join(SEARCH_FIELDS)}, {score} AS score
+        FROM `tabComplain`
+        WHERE {" AND ".join(conditions)} {get_match_cond("Complain")}
+        ORDER BY score DESC, creation DESC
+        LIMIT %(limit)s OFFSET %(start)s
+    """, {**values, "limit": limit + 1, "start": start}, as_dict=True)
+
+    next_start = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_start = start + limit
+
+    return create_response(data=rows, meta={"count": len(rows), "next_start": next_start})
+
+def _fulltext_terms(query):
+    # Boolean-mode operators are stripped; each remaining word is required and prefix-matched.
+    words = re.findall(r"\w+", query)
+    return " ".join(f"+{word}*" for word in words)
 
 @frappe.whitelist()
 def update_closing_remarks(complain_name, closing_remarks):
@@ -175,4 +562,5 @@ def update_closing_remarks(complain_name, closing_remarks):
         return create_response(success=False, code=NOT_FOUND, message="Complain not found")
 
     frappe.db.set_value("Complain", complain_name, "closing_remarks", closing_remarks or "")
+    complain_sync.record_change(complain_name, [frappe.db.get_value("Complain", complain_name, "assigned_to_technician")])
     return create_response(message="Closing remarks updated", data={"closing_remarks": closing_remarks or ""})
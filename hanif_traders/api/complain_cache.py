@@ -0,0 +1,73 @@
+"""Cached lookups for the mobile complaint endpoints.
+
+Per-technician complaint counts by workflow state, and the size of the
+shared Open pool, are computed with one GROUP BY and then served from the
+cache. `complain_sync.record_change`, which every complaint write already
+calls, invalidates the affected keys after the write commits. The user -> technician lookup is
+cached as well and cleared whenever a Technician changes.
+"""
+
+from functools import partial
+
+import frappe
+
+STATE_COUNTS_KEY = "complain_state_counts"
+POOL_COUNT_KEY = "complain_open_pool_count"
+USER_TECHNICIAN_KEY = "complain_user_technician"
+COUNTS_TTL = 3600
+
+
+def get_user_technician(user):
+    """
+    (technician, is_test_account) for a user; (None, False) when none is linked.
+    """
+    cached = frappe.cache().hget(USER_TECHNICIAN_KEY, user)
+    if cached is not None:
+        return tuple(cached)
+
+    employee = frappe.db.get_value("Employee", {"user_id": user}, "name")
+    technician = frappe.db.get_value("Technician", {"employee_id": employee}, "name") if employee else None
+    is_test = bool(technician and frappe.db.get_value("Technician", technician, "is_test_account"))
+    frappe.cache().hset(USER_TECHNICIAN_KEY, user, [technician, is_test])
+    return technician, is_test
+
+
+def clear_user_technician_cache(doc=None, method=None):
+    frappe.cache().delete_value(USER_TECHNICIAN_KEY)
+
+
+def get_state_counts(technician):
+    """
+    {workflow_state: count} of complaints assigned to `technician`.
+    """
+    key = f"{STATE_COUNTS_KEY}:{technician}"
+    counts = frappe.cache().get_value(key)
+    if counts is None:
+        counts = dict(frappe.db.sql("""
+            SELECT workflow_state, COUNT(*)
+            FROM `tabComplain`
+            WHERE assigned_to_technician = %s
+            GROUP BY workflow_state
+        """, (technician,)))
+        frappe.cache().set_value(key, counts, expires_in_sec=COUNTS_TTL)
+    return counts
+
+
+def get_open_pool_count():
+    count = frappe.cache().get_value(POOL_COUNT_KEY)
+    if count is None:
+        count = frappe.db.count("Complain", {"workflow_state": "Open"})
+        frappe.cache().set_value(POOL_COUNT_KEY, count, expires_in_sec=COUNTS_TTL)
+    return count
+
+
+def invalidate_counts(technicians=(), pool=False):
+    """
+    Drop the affected count keys once the current transaction commits.
+    Deleting earlier would let a concurrent reader cache the old counts again.
+    """
+    keys = [f"{STATE_COUNTS_KEY}:{t}" for t in technicians if t]
+    if pool:
+        keys.append(POOL_COUNT_KEY)
+    if keys:
+        frappe.db.after_commit.add(partial(frappe.cache().delete_value, keys))
@@ -0,0 +1,127 @@
+"""Change feed behind `sync_complains`.
+
+Every write that can change what a technician sees appends rows to
+`Complain Sync Log`. There is one row for each technician whose list may
+have changed (the assignee, and the previous assignee on reassignment),
+and one with no technician when the complaint enters or leaves the shared
+Open pool. The autoincrement row id is the sync token. The feed only says
+*which* complaints to re-check; `sync_complains` re-reads them and turns
+the ones no longer visible into tombstones.
+
+Rows are written inside the transaction that changes the complaint, so
+ids can become visible out of order. Tokens therefore never pass the
+newest row older than `SAFETY_LAG_SECONDS`: every lower id was allocated
+before it and has committed (or rolled back) by then.
+"""
+
+import frappe
+from frappe.utils import add_days, add_to_date, cint, now_datetime
+
+from hanif_traders.api import complain_cache
+
+RETENTION_DAYS = 30
+PURGED_UPTO_KEY = "complain_sync_purged_upto"
+CHANGE_BATCH_SIZE = 500
+# Longer than any transaction that writes sync rows is expected to stay open.
+SAFETY_LAG_SECONDS = 10
+
+
+def record_change(complain, technicians=(), pool=False):
+    """
+    Append change rows for `complain` in one statement, and drop the
+    cached state counts they affect.
+    """
+    record_changes([complain], technicians, pool)
+
+
+def record_changes(complains, technicians=(), pool=False):
+    """
+    Same as `record_change` for several complaints that changed the same way.
+    """
+    targets = [t for t in dict.fromkeys(technicians) if t]
+    complain_cache.invalidate_counts(targets, pool)
+    if pool:
+        targets.append(None)
+    if not targets or not complains:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    values = []
+    for complain in complains:
+        for technician in targets:
+            values.extend([now, now, user, user, complain, technician])
+
+    frappe.db.sql(f"""
+        INSERT INTO `tabComplain Sync Log` (creation, modified, owner, modified_by, complain, technician)
+        VALUES {", ".join(["(%s, %s, %s, %s, %s, %s)"] * (len(targets) * len(complains)))}
+    """, values)
+
+
+def record_doc_change(doc, old=None):
+    """
+    Record a saved or deleted `Complain`, given its state before the write.
+    """
+    record_change(
+        doc.name,
+        [doc.assigned_to_technician, old.assigned_to_technician if old else None],
+        pool=doc.workflow_state == "Open" or bool(old and old.workflow_state == "Open"),
+    )
+
+
+def get_latest_token():
+    """
+    Highest token safe to hand out: the newest row at least SAFETY_LAG_SECONDS old.
+    """
+    cutoff = add_to_date(now_datetime(), seconds=-SAFETY_LAG_SECONDS)
+    token = frappe.db.sql("""
+        SELECT name FROM `tabComplain Sync Log`
+        WHERE creation <= %s
+        ORDER BY name DESC
+        LIMIT 1
+    """, (cutoff,))
+    return max(cint(token[0][0]) if token else 0, get_purged_upto())
+
+
+def get_purged_upto():
+    return cint(frappe.db.get_global(PURGED_UPTO_KEY))
+
+
+def get_changes(technician, since, include_pool=True, limit=CHANGE_BATCH_SIZE, upto=None):
+    """
+    Complaints changed for `technician` after token `since` and up to token
+    `upto` (get_latest_token by default), oldest first.
+    Returns (names, last_token, has_more).
+    """
+    if upto is None:
+        upto = get_latest_token()
+    pool_condition = "OR technician IS NULL" if include_pool else ""
+    rows = frappe.db.sql(f"""
+        SELECT complain, MAX(name) AS token
+        FROM `tabComplain Sync Log`
+        WHERE name > %(since)s AND name <= %(upto)s AND (technician = %(technician)s {pool_condition})
+        GROUP BY complain
+        ORDER BY token
+        LIMIT %(limit)s
+    """, {"since": since, "upto": upto, "technician": technician, "limit": limit + 1}, as_dict=True)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return [row.complain for row in rows], (rows[-1].token if rows else since), has_more
+
+
+def purge_old_changes():
+    """
+    Scheduler hook: drop feed rows older than the retention window. Tokens
+    at or below the purged id can no longer be served incrementally.
+    """
+    upto = frappe.db.sql(
+        "SELECT MAX(name) FROM `tabComplain Sync Log` WHERE creation < %s",
+        (add_days(now_datetime(), -RETENTION_DAYS),),
+    )[0][0]
+    if not upto:
+        return
+
+    frappe.db.sql("DELETE FROM `tabComplain Sync Log` WHERE name <= %s", (upto,))
+    frappe.db.set_global(PURGED_UPTO_KEY, upto)
+    frappe.db.commit()
@@ -0,0 +1,240 @@
+"""Plain-Python geometry helpers shared by the location APIs."""
+
+import math
+
+EARTH_RADIUS_M = 6371008.8
+# Ground resolution of one web-map pixel at zoom 0 on the equator.
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in meters between two points.
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def segment_distances(lats, lons):
+    """
+    Distances in meters between consecutive points, computed in one pass
+    over the coordinate columns (len(lats) - 1 values).
+    """
+    phi = [math.radians(v) for v in lats]
+    lmb = [math.radians(v) for v in lons]
+    cos_phi = [math.cos(v) for v in phi]
+    return [
+        2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(
+            math.sin((p2 - p1) / 2) ** 2 + c1 * c2 * math.sin((l2 - l1) / 2) ** 2
+        )))
+        for p1, p2, l1, l2, c1, c2 in zip(phi, phi[1:], lmb, lmb[1:], cos_phi, cos_phi[1:], strict=False)
+    ]
+
+
+def zoom_to_tolerance(zoom, latitude=0.0):
+    """
+    Simplification tolerance in meters matching one pixel at a web-map zoom level.
+    """
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** float(zoom))
+
+
+def simplify(points, tolerance, key=lambda p: (p["latitude"], p["longitude"])):
+    """
+    Douglas-Peucker simplification. `tolerance` is in meters; `key` returns
+    (lat, lon) for an item. Returns the kept items in their original order.
+    """
+    if tolerance <= 0 or len(points) < 3:
+        return list(points)
+
+    # Project onto a local equirectangular plane (meters) around the first point.
+    lat0 = math.radians(key(points[0])[0])
+    scale = math.radians(1) * EARTH_RADIUS_M
+    xy = [(lon * scale * math.cos(lat0), lat * scale) for lat, lon in map(key, points)]
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        index, distance = _farthest(xy, first, last)
+        if distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [point for point, kept in zip(points, keep, strict=True) if kept]
+
+
+def _farthest(xy, first, last):
+    (x1, y1), (x2, y2) = xy[first], xy[last]
+    dx, dy = x2 - x1, y2 - y1
+    length_sq = dx * dx + dy * dy
+    best_index, best_distance = first, -1.0
+    for i in range(first + 1, last):
+        px, py = xy[i]
+        if length_sq:
+            t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+            distance = math.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+        else:
+            distance = math.hypot(px - x1, py - y1)
+        if distance > best_distance:
+            best_index, best_distance = i, distance
+    return best_index, best_distance
+
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_INDEX = {c: i for i, c in enumerate(GEOHASH_ALPHABET)}
+
+
+def geohash_encode(latitude, longitude, precision=9):
+    """
+    Standard base-32 geohash of a point.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def geohash_bbox(geohash):
+    """
+    (min_lat, min_lon, max_lat, max_lon) of a geohash cell.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_INDEX[char]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if value >> shift & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def geohash_neighbours(geohash):
+    """
+    The eight cells surrounding `geohash`, at the same precision.
+    """
+    min_lat, min_lon, max_lat, max_lon = geohash_bbox(geohash)
+    height, width = max_lat - min_lat, max_lon - min_lon
+    lat, lon = (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+    cells = set()
+    for dlat in (-1, 0, 1):
+        for dlon in (-1, 0, 1):
+            if not dlat and not dlon:
+                continue
+            n_lat = lat + dlat * height
+            if not -90 < n_lat < 90:
+                continue
+            n_lon = (lon + dlon * width + 180) % 360 - 180
+            cells.add(geohash_encode(n_lat, n_lon, len(geohash)))
+    cells.discard(geohash)
+    return sorted(cells)
+
+
+def geohash_cell_size(geohash):
+    """
+    Smaller side of a geohash cell in meters (measured at its center).
+    """
+    min_lat, min_lon, max_lat, max_lon = geohash_bbox(geohash)
+    lat = (min_lat + max_lat) / 2
+    return min(
+        haversine(min_lat, min_lon, max_lat, min_lon),
+        haversine(lat, min_lon, lat, max_lon),
+    )
+
+
+def encode_polyline(coordinates, precision=5):
+    """
+    Encode [(lat, lon), ...] with the Google encoded polyline algorithm.
+    """
+    factor = 10 ** precision
+    values = []
+    for lat, lon in coordinates:
+        values.append(round(lat * factor))
+        values.append(round(lon * factor))
+    return "".join(_encode_value(v) for v in _interleaved_deltas(values, 2))
+
+
+def decode_polyline(encoded, precision=5):
+    """
+    Decode a Google encoded polyline into [(lat, lon), ...].
+    """
+    factor = 10 ** precision
+    values = _undelta(_decode_values(encoded), 2)
+    return [(values[i] / factor, values[i + 1] / factor) for i in range(0, len(values) - 1, 2)]
+
+
+def encode_integers(values):
+    """
+    Delta-encode a sequence of integers with the polyline character scheme.
+    """
+    return "".join(_encode_value(v) for v in _interleaved_deltas(values, 1))
+
+
+def decode_integers(encoded):
+    return _undelta(_decode_values(encoded), 1)
+
+
+def _interleaved_deltas(values, stride):
+    previous = [0] * stride
+    for i, value in enumerate(values):
+        yield value - previous[i % stride]
+        previous[i % stride] = value
+
+
+def _undelta(deltas, stride):
+    totals = [0] * stride
+    values = []
+    for i, delta in enumerate(deltas):
+        totals[i % stride] += delta
+        values.append(totals[i % stride])
+    return values
+
+
+def _encode_value(value):
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1F)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return "".join(chunks)
+
+
+def _decode_values(encoded):
+    values = []
+    value = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1F) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    return values
@@ -1,99 +1,545 @@
+import base64
+import json
+from functools import partial
+
 import frappe
-from frappe.utils import now_datetime, get_datetime, getdate
+from frappe.utils import now_datetime, get_datetime, getdate, flt, cint, get_first_day_of_week
 from datetime import datetime, time
-from hanif_traders.api.response import create_response, SUCCESS, UNAUTHORIZED, VALIDATION_ERROR, OFF_DUTY, DUTY_EXPIRED, NOT_FOUND, SERVER_ERROR
+from redis.exceptions import ConnectionError as RedisConnectionError
+from hanif_traders.api.response import create_response, SUCCESS, UNAUTHORIZED, VALIDATION_ERROR, OFF_DUTY, DUTY_EXPIRED, NOT_FOUND, RATE_LIMITED, SERVER_ERROR
+from hanif_traders.api import (
+    location_buffer, location_codec, location_compaction, location_dwell, location_filter, location_heatmap,
+    location_history, location_metrics, location_sampling, location_summary,
+)
+from hanif_traders.api.geo import (
+    encode_polyline, geohash_cell_size, geohash_encode, geohash_neighbours, haversine, simplify, zoom_to_tolerance,
+)
+
+LOG_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "technician", "technician_name", "employee", "employee_checkin",
+    "device_id", "source", "latitude", "longitude", "accuracy", "geohash", "speed",
+    "heading", "altitude", "battery_level", "network_type", "captured_at", "received_at",
+    "is_valid", "reject_reason",
+)
+LATEST_FIELDS = (
+    "technician", "technician_name", "employee", "employee_checkin", "device_id",
+    "latitude", "longitude", "accuracy", "speed", "heading", "geohash", "received_at", "location_log",
+)
+SOURCES = ("foreground", "background")
+NETWORK_TYPES = ("wifi", "cellular", "offline")
+MAX_BATCH_SIZE = 500
+GEOHASH_PRECISION = 9
+POSITION_EVENT = "technician_location_update"
+DERIVED_PENDING_KEY = "technician_location_derived_pending"
+DERIVED_LOCK_KEY = "technician_location_derived_lock"
+# Cell size of the first neighbourhood searched by get_nearest_technicians (~1.2 km).
+NEAREST_START_PRECISION = 6
+ROUTE_PAGE_SIZE = 2000
+MAX_ROUTE_PAGE_SIZE = 5000
+MAX_HEATMAP_CELLS = 5000
 
 @frappe.whitelist(methods=["POST"])
-def ingest(latitude, longitude, accuracy=None, speed=None, heading=None, altitude=None, captured_at=None, device_id=None, source="foreground"):
+def ingest(latitude, longitude, accuracy=None, speed=None, heading=None, altitude=None, captured_at=None, device_id=None, source="foreground", battery_level=None, network_type=None):
     """
     Ingest a single GPS telemetry point.
+
+    `meta.next_interval` is the recommended number of seconds before the
+    tracker's next fix (see api/location_sampling.py).
     """
-    user = frappe.session.user
-    if not user or user == "Guest":
-        return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
+    with location_metrics.track_request():
+        user = frappe.session.user
+        if not user or user == "Guest":
+            return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
 
-    try:
-        latitude = float(latitude)
-        longitude = float(longitude)
-    except Exception:
-        return create_response(success=False, code=VALIDATION_ERROR, message="Invalid latitude/longitude")
+        point, error = _parse_point({
+            "latitude": latitude,
+            "longitude": longitude,
+            "accuracy": accuracy,
+            "speed": speed,
+            "heading": heading,
+            "altitude": altitude,
+            "captured_at": captured_at,
+            "device_id": device_id,
+            "source": source,
+            "battery_level": battery_level,
+            "network_type": network_type,
+        })
+        if error:
+            location_metrics.reject(location_metrics.INVALID_POINT)
+            return create_response(success=False, code=error[0], message=error[1])
 
-    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
-        return create_response(success=False, code=VALIDATION_ERROR, message="Coordinates out of range")
+        # 1. Resolve Identity and Verify Duty State
+        context, response = _resolve_ingest_context(user)
+        if response:
+            return response
+
+        location_metrics.incr("received")
+        _observe_lags([point])
+        kept, dropped = location_filter.coalesce_points(context.technician, [point])
+        if dropped:
+            location_metrics.incr("coalesced")
+            return create_response(
+                message="Location coalesced",
+                meta={"next_interval": location_sampling.recommend_interval(point, point.battery_level, stationary=True)},
+            )
+
+        # 2. Insert Log
+        try:
+            if not _store_log_rows(_build_log_rows(context, kept)):
+                location_metrics.reject("buffer_full")
+                return create_response(
+                    success=False,
+                    code=RATE_LIMITED,
+                    message="Location buffer is full. Please retry later.",
+                    meta={"next_interval": location_sampling.backoff_interval()},
+                )
+            location_filter.remember_kept(context.technician, kept)
+
+            return create_response(
+                message="Location ingested",
+                meta={"next_interval": location_sampling.recommend_interval(point, point.battery_level)},
+            )
+
+        except Exception as e:
+            frappe.log_error(
+                title="Location Ingest Error",
+                message=frappe.get_traceback(),
+            )
+            return create_response(success=False, code=SERVER_ERROR, message="Internal Server Error")
+
+@frappe.whitelist(methods=["POST"])
+def ingest_batch(points=None, device_id=None, source="foreground", payload=None, compression=None, battery_level=None, network_type=None):
+    """
+    Ingest a batch of GPS telemetry points (e.g. a buffered offline backlog).
+
+    `points` is a list (or JSON array) of objects with the same keys as `ingest`.
+    Bandwidth-constrained clients can instead send `payload` in the compact
+    delta-encoded format (see api/location_codec.py), optionally gzip
+    `compression`. Identity and duty state are resolved once and all valid
+    points are written with a single bulk insert. `data` holds one result per
+    point, in input order, and `meta.next_interval` the recommended seconds
+    before the next fix. `battery_level` and `network_type` apply to points
+    that do not carry their own.
+    """
+    with location_metrics.track_request():
+        user = frappe.session.user
+        if not user or user == "Guest":
+            return create_response(success=False, code=UNAUTHORIZED, message="Authentication required")
+
+        if payload:
+            try:
+                points = location_codec.decode_payload(payload, compression)
+            except location_codec.PayloadError as e:
+                return create_response(success=False, code=VALIDATION_ERROR, message=str(e))
+
+        if isinstance(points, str):
+            try:
+                points = json.loads(points)
+            except ValueError:
+                return create_response(success=False, code=VALIDATION_ERROR, message="points must be a JSON array")
+
+        if not isinstance(points, list) or not points:
+            return create_response(success=False, code=VALIDATION_ERROR, message="points must be a non-empty array")
+
+        if len(points) > MAX_BATCH_SIZE:
+            return create_response(success=False, code=VALIDATION_ERROR, message=f"A batch can hold at most {MAX_BATCH_SIZE} points")
+
+        context, response = _resolve_ingest_context(user)
+        if response:
+            return response
+
+        results = []
+        accepted = []
+        index_of = {}
+        for index, raw in enumerate(points):
+            if not isinstance(raw, dict):
+                results.append(_point_result(index, VALIDATION_ERROR, "Point must be an object"))
+                continue
+
+            raw.setdefault("device_id", device_id)
+            raw.setdefault("source", source)
+            raw.setdefault("battery_level", battery_level)
+            raw.setdefault("network_type", network_type)
+            point, error = _parse_point(raw)
+            if error:
+                results.append(_point_result(index, *error))
+                continue
 
-    # 1. Resolve Identity
-    employee = (
+            accepted.append(point)
+            index_of[id(point)] = index
+            results.append(_point_result(index, SUCCESS, "Location ingested"))
+
+        # Near-duplicate fixes are acknowledged so the device does not resend them.
+        kept, dropped = location_filter.coalesce_points(context.technician, accepted)
+        for point in dropped:
+            results[index_of[id(point)]]["message"] = "Location coalesced"
+        location_metrics.incr("received", len(accepted))
+        location_metrics.incr("coalesced", len(dropped))
+        location_metrics.reject(location_metrics.INVALID_POINT, len(points) - len(accepted))
+        _observe_lags(accepted)
+
+        try:
+            rows = _build_log_rows(context, kept)
+            if not _store_log_rows(rows):
+                location_metrics.reject("buffer_full", len(rows))
+                return create_response(
+                    success=False,
+                    code=RATE_LIMITED,
+                    message="Location buffer is full. Please retry later.",
+                    meta={"next_interval": location_sampling.backoff_interval()},
+                )
+            location_filter.remember_kept(context.technician, kept)
+        except Exception:
+            frappe.log_error(
+                title="Location Batch Ingest Error",
+                message=frappe.get_traceback(),
+            )
+            return create_response(success=False, code=SERVER_ERROR, message="Internal Server Error")
+
+        # Outliers are stored but flagged; only known when written directly.
+        for point, row in zip(kept, rows, strict=True):
+            if row.reject_reason:
+                results[index_of[id(point)]]["reject_reason"] = row.reject_reason
+
+        # The newest fix reflects the device's current state.
+        latest = max(accepted, key=lambda p: p.captured_at, default=None)
+        next_interval = location_sampling.recommend_interval(
+            latest,
+            latest.battery_level if latest else battery_level,
+            stationary=any(p is latest for p in dropped),
+        )
+
+        return create_response(
+            message=f"{len(accepted)} of {len(points)} points ingested",
+            data=results,
+            meta={
+                "accepted": len(accepted),
+                "rejected": len(points) - len(accepted),
+                "coalesced": len(dropped),
+                "next_interval": next_interval,
+            },
+        )
+
+def _point_result(index, code, message):
+    return {"index": index, "success": code == SUCCESS, "code": code, "message": message}
+
+def _observe_lags(points):
+    for point in points:
+        if point.lag is not None:
+            location_metrics.observe_lag(point.lag)
+
+def _resolve_employee(user):
+    return (
         frappe.db.get_value("Employee", {"user_id": user}, "name")
         or frappe.db.get_value("Employee", {"company_email": user}, "name")
         or frappe.db.get_value("Employee", {"personal_email": user}, "name")
     )
-    
+
+def _resolve_ingest_context(user):
+    """
+    Resolve Employee, Technician and the active checkin for `user`.
+    Returns (context, None) or (None, error response).
+    """
+    employee = _resolve_employee(user)
     if not employee:
-        return create_response(success=False, code=NOT_FOUND, message="Employee not found")
+        return None, create_response(success=False, code=NOT_FOUND, message="Employee not found")
 
-    technician = frappe.db.get_value("Technician", {"employee_id": employee}, "name")
+    technician = frappe.db.get_value("Technician", {"employee_id": employee}, ["name", "technician_name"], as_dict=True)
     if not technician:
-         return create_response(success=False, code=NOT_FOUND, message="Technician profile not found")
+        return None, create_response(success=False, code=NOT_FOUND, message="Technician profile not found")
 
-    # 2. Verify Duty State
     # We need the active checkin to link it.
-    last_checkin = frappe.db.get_value("Employee Checkin", 
-        {"employee": employee}, 
-        ["name", "log_type", "time"], 
+    last_checkin = frappe.db.get_value("Employee Checkin",
+        {"employee": employee},
+        ["name", "log_type", "time"],
         order_by="time desc",
         as_dict=True
     )
 
     if not last_checkin or last_checkin.log_type != "IN":
-        return create_response(success=False, code=OFF_DUTY, message="Technician is OFF DUTY")
+        return None, create_response(success=False, code=OFF_DUTY, message="Technician is OFF DUTY")
 
     if getdate(last_checkin.time) != getdate(now_datetime()):
-        return create_response(success=False, code=DUTY_EXPIRED, message="Duty expired. Please check in again.")
+        return None, create_response(success=False, code=DUTY_EXPIRED, message="Duty expired. Please check in again.")
+
+    return frappe._dict({
+        "employee": employee,
+        "technician": technician.name,
+        "technician_name": technician.technician_name,
+        "employee_checkin": last_checkin.name,
+    }), None
+
+def _parse_point(raw):
+    """
+    Validate and normalise one raw point.
+    Returns (point, None) or (None, (code, message)).
+    """
+    try:
+        latitude = float(raw.get("latitude"))
+        longitude = float(raw.get("longitude"))
+    except Exception:
+        return None, (VALIDATION_ERROR, "Invalid latitude/longitude")
 
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None, (VALIDATION_ERROR, "Coordinates out of range")
+
+    now = now_datetime()
+    lag = None
+    captured_at = raw.get("captured_at")
     if captured_at:
         try:
-            captured_at = frappe.utils.get_datetime(captured_at)
+            captured_at = get_datetime(captured_at)
+            # Negative when the device clock is ahead of the server.
+            lag = (now - captured_at).total_seconds()
             # Reject future timestamps
-            if captured_at > now_datetime():
-                captured_at = now_datetime()
+            if captured_at > now:
+                captured_at = now
         except Exception:
-            captured_at = now_datetime()
+            captured_at = now
     else:
-        captured_at = now_datetime()
-    # 3. Insert Log
-    try:
-        log = frappe.new_doc("Technician Location Log")
-        log.technician = technician
-        log.employee = employee
-        log.employee_checkin = last_checkin.name
-        log.device_id = device_id
-        log.source = source
-        log.latitude = latitude
-        log.longitude = longitude
-        if accuracy is not None:
-            log.accuracy = accuracy
-        if speed is not None:
-            log.speed = speed
-        if heading is not None:
-            log.heading = heading
-        if altitude is not None:
-            log.altitude = altitude
-        
-        log.captured_at = captured_at
-        log.received_at = now_datetime()
-        
-        log.insert(ignore_permissions=True)
-        
-        log.insert(ignore_permissions=True)
-        
-        return create_response(message="Location ingested")
-
-    except Exception as e:
-        frappe.log_error(
-            title="Location Ingest Error",
-            message=frappe.get_traceback(),
+        captured_at = now
+
+    point = frappe._dict({
+        "latitude": latitude,
+        "longitude": longitude,
+        "captured_at": captured_at,
+        "device_id": raw.get("device_id"),
+        "source": raw.get("source") if raw.get("source") in SOURCES else "foreground",
+        "lag": lag,
+    })
+    for field in ("accuracy", "speed", "heading", "altitude"):
+        value = raw.get(field)
+        point[field] = flt(value) if value not in (None, "") else None
+
+    battery_level = raw.get("battery_level")
+    point.battery_level = min(100, max(0, cint(battery_level))) if battery_level not in (None, "") else None
+    point.network_type = raw.get("network_type") if raw.get("network_type") in NETWORK_TYPES else None
+
+    return point, None
+
+def _build_log_rows(context, points):
+    """
+    Turn parsed points into `Technician Location Log` rows keyed by LOG_FIELDS.
+    """
+    now = now_datetime()
+    user = frappe.session.user
+    rows = []
+    for point in points:
+        rows.append(frappe._dict({
+            "name": frappe.generate_hash(length=10),
+            "creation": now,
+            "modified": now,
+            "owner": user,
+            "modified_by": user,
+            "docstatus": 0,
+            "technician": context.technician,
+            "technician_name": context.technician_name,
+            "employee": context.employee,
+            "employee_checkin": context.employee_checkin,
+            "device_id": point.device_id,
+            "source": point.source,
+            "latitude": point.latitude,
+            "longitude": point.longitude,
+            "accuracy": point.accuracy,
+            "geohash": geohash_encode(point.latitude, point.longitude, GEOHASH_PRECISION),
+            "speed": point.speed,
+            "heading": point.heading,
+            "altitude": point.altitude,
+            "battery_level": point.battery_level,
+            "network_type": point.network_type,
+            "captured_at": point.captured_at,
+            "received_at": now,
+            "is_valid": 1,
+            "reject_reason": None,
+        }))
+    return rows
+
+def _store_log_rows(rows):
+    """
+    Hand rows to the write-behind buffer in Buffered mode, otherwise write them now.
+    Returns False when the buffer is full and the caller should back off.
+    """
+    if not rows:
+        return True
+
+    if location_buffer.is_enabled():
+        return location_buffer.enqueue_rows(rows)
+
+    write_log_rows(rows, defer_derived=True)
+    return True
+
+def write_log_rows(rows, defer_derived=False):
+    """
+    Write `Technician Location Log` rows with a single bulk insert.
+    Used by the direct ingest path and by the buffer flush.
+
+    Outliers are flagged and the latest position moved inline, since the
+    next fix is checked against it. Distance summaries, dwells and the map
+    push are derived afterwards: inline from the (background) buffer flush,
+    and from a job after commit when `defer_derived` is set.
+    """
+    if not rows:
+        return
+
+    location_filter.apply_outlier_filter(rows)
+    values = [tuple(row.get(field) for field in LOG_FIELDS) for row in rows]
+    frappe.db.bulk_insert("Technician Location Log", LOG_FIELDS, values)
+
+    valid_rows = [row for row in rows if row.is_valid]
+    location_metrics.incr("stored", len(rows))
+    location_metrics.incr("flagged", len(rows) - len(valid_rows))
+    for row in rows:
+        if row.reject_reason:
+            location_metrics.reject(row.reject_reason)
+    if not valid_rows:
+        return
+
+    _upsert_latest_locations(valid_rows)
+    if defer_derived:
+        names_by_technician = {}
+        for row in valid_rows:
+            names_by_technician.setdefault(row.technician, []).append(row.name)
+        frappe.db.after_commit.add(partial(_enqueue_derived_updates, names_by_technician))
+    else:
+        update_derived(rows=valid_rows)
+
+def update_derived(names=None, rows=None):
+    """
+    Fold stored valid rows (given, or read back by `names`) into distance
+    summaries and dwells, and push the newest positions to the ops map.
+    """
+    if rows is None:
+        rows = frappe.get_all(
+            "Technician Location Log",
+            filters={"name": ["in", names], "is_valid": 1},
+            fields=list(LOG_FIELDS),
         )
-        return create_response(success=False, code=SERVER_ERROR, message="Internal Server Error")
+    if not rows:
+        return
+
+    location_summary.update_summaries(rows)
+    location_dwell.update_dwells(rows)
+    _publish_position_deltas(list(_newest_per_technician(rows).values()))
+
+def _enqueue_derived_updates(names_by_technician):
+    """
+    Queue committed rows on their technician's pending list and start a job to fold them.
+    """
+    cache = frappe.cache()
+    for technician, names in names_by_technician.items():
+        try:
+            cache.pipeline().rpush(cache.make_key(f"{DERIVED_PENDING_KEY}:{technician}"), *names).execute()
+            frappe.enqueue("hanif_traders.api.location.update_derived_for_technician", queue="short", technician=technician)
+        except RedisConnectionError:
+            # No queue without Redis; the rows are committed, so derive them here.
+            update_derived(names=names)
+            frappe.db.commit()
+
+def update_derived_for_technician(technician):
+    """
+    Background job: fold every pending row of `technician` in one pass.
+
+    Summaries and dwells are read-modify-write, so jobs for one technician
+    serialize on a lock. A job that finds the lock taken leaves its rows to
+    the holder, which checks the pending list again after releasing it.
+    """
+    cache = frappe.cache()
+    pending = f"{DERIVED_PENDING_KEY}:{technician}"
+    lock_key = cache.make_key(f"{DERIVED_LOCK_KEY}:{technician}")
+    while cache.set(lock_key, 1, nx=True, ex=300):
+        try:
+            names = cache.pipeline().lrange(cache.make_key(pending), 0, -1).delete(cache.make_key(pending)).execute()[0]
+            if names:
+                update_derived(names=[frappe.safe_decode(name) for name in names])
+                frappe.db.commit()
+        finally:
+            cache.delete(lock_key)
+
+        if not cache.llen(pending):
+            break
+
+def _newest_per_technician(rows):
+    latest = {}
+    for row in rows:
+        current = latest.get(row.technician)
+        if not current or row.captured_at >= current.captured_at:
+            latest[row.technician] = row
+    return latest
+
+def _upsert_latest_locations(rows):
+    """
+    Keep `Technician Latest Location` at one row per technician holding the
+    newest point, with a single INSERT ... ON DUPLICATE KEY UPDATE.
+    """
+    latest = _newest_per_technician(rows)
+
+    now = now_datetime()
+    user = frappe.session.user
+    values = []
+    params = []
+    for row in latest.values():
+        values.append(f"({', '.join(['%s'] * (len(LATEST_FIELDS) + 6))})")
+        params.extend([row.technician, now, now, user, user, 0])
+        params.extend(row.name if field == "location_log" else row.get(field) for field in LATEST_FIELDS)
+        params.append(row.captured_at)
+
+    # Only move forward in time: a late backlog point must not replace a newer
+    # position. captured_at is assigned last because MariaDB evaluates the
+    # assignments left to right against the already updated row.
+    updates = ", ".join(
+        f"`{field}` = IF(VALUES(`captured_at`) >= `captured_at`, VALUES(`{field}`), `{field}`)"
+        for field in (*LATEST_FIELDS, "modified")
+    )
+    columns = ", ".join(f"`{field}`" for field in ("name", "creation", "modified", "owner", "modified_by", "docstatus", *LATEST_FIELDS, "captured_at"))
+    frappe.db.sql(f"""
+        INSERT INTO `tabTechnician Latest Location` ({columns})
+        VALUES {", ".join(values)}
+        ON DUPLICATE KEY UPDATE {updates},
+            `captured_at` = GREATEST(`captured_at`, VALUES(`captured_at`))
+    """, params)
+
+    return list(latest.values())
+
+def _publish_position_deltas(rows):
+    """
+    Push new positions to the ops map, at most one per technician per
+    `location_push_interval` seconds, coalesced into a single event.
+    Throttled updates are not resent; the map's periodic snapshot
+    refresh picks them up.
+    """
+    # Unset falls back to the field default of 10; a saved 0 disables live updates.
+    interval = cint(frappe.get_cached_doc("Complain Settings").location_push_interval, 10)
+    if interval <= 0 or not rows:
+        return
+
+    cache = frappe.cache()
+    try:
+        pipeline = cache.pipeline()
+        for row in rows:
+            pipeline.set(cache.make_key(f"technician_location_push:{row.technician}"), 1, nx=True, ex=interval)
+        allowed = pipeline.execute()
+    except RedisConnectionError:
+        # Without Redis there is no realtime either; the map's snapshot refresh catches up.
+        return
+    due = [row for row, ok in zip(rows, allowed, strict=True) if ok]
+    if not due:
+        return
+
+    positions = [{
+        "technician": row.technician,
+        "technician_name": row.technician_name,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "captured_at": row.captured_at,
+    } for row in due]
+
+    frappe.publish_realtime(
+        POSITION_EVENT,
+        {"positions": positions},
+        doctype="Technician Latest Location",
+        after_commit=True,
+    )
 
 @frappe.whitelist()
 def get_latest_locations(on_duty_only=True):
@@ -101,10 +547,87 @@ def get_latest_locations(on_duty_only=True):
     Get the last known location of technicians.
     """
     # Role check could be added here if needed
+    on_duty_only = frappe.utils.sbool(on_duty_only)
+    filters = {}
+
+    if on_duty_only:
+        active_checkin_map = _get_active_checkin_map()
+        if not active_checkin_map:
+            return create_response(data=[])
+
+        # Strict: Only show location from CURRENT active shift
+        filters["employee_checkin"] = ["in", list(active_checkin_map.values())]
+
+    results = frappe.get_all(
+        "Technician Latest Location",
+        filters=filters,
+        fields=["technician", "technician_name", "latitude", "longitude", "captured_at"],
+        order_by="captured_at desc",
+    )
+
+    return create_response(data=results, meta={"count": len(results)})
+
+@frappe.whitelist()
+def get_nearest_technicians(latitude, longitude, k=5):
+    """
+    The `k` nearest on-duty technicians to a point, by their latest position.
+
+    Candidates come from the point's geohash cell and its eight neighbours,
+    widening one precision level at a time until the k-th candidate is
+    provably inside the searched area; they are then ranked by haversine.
+    """
+    try:
+        latitude = float(latitude)
+        longitude = float(longitude)
+    except Exception:
+        return create_response(success=False, code=VALIDATION_ERROR, message="Invalid latitude/longitude")
+
+    k = max(cint(k) or 5, 1)
+    active_checkins = list(_get_active_checkin_map().values())
+    if not active_checkins:
+        return create_response(data=[])
+
+    fields = ["technician", "technician_name", "latitude", "longitude", "captured_at"]
+    candidates = []
+    for precision in range(NEAREST_START_PRECISION, 2, -1):
+        center = geohash_encode(latitude, longitude, precision)
+        cells = [center, *geohash_neighbours(center)]
+        candidates = frappe.get_all(
+            "Technician Latest Location",
+            filters={"employee_checkin": ["in", active_checkins]},
+            or_filters=[["geohash", "like", f"{cell}%"] for cell in cells],
+            fields=fields,
+        )
+        _rank_by_distance(candidates, latitude, longitude)
+        # Anything outside the 3x3 block is at least one cell side away.
+        if len(candidates) >= k and candidates[k - 1].distance_m <= geohash_cell_size(center):
+            break
+    else:
+        candidates = frappe.get_all(
+            "Technician Latest Location",
+            filters={"employee_checkin": ["in", active_checkins]},
+            fields=fields,
+        )
+        _rank_by_distance(candidates, latitude, longitude)
+
+    results = candidates[:k]
+    for row in results:
+        row.distance_km = round(row.pop("distance_m") / 1000, 3)
+
+    return create_response(data=results, meta={"count": len(results)})
+
+def _rank_by_distance(rows, latitude, longitude):
+    for row in rows:
+        row.distance_m = haversine(latitude, longitude, row.latitude, row.longitude)
+    rows.sort(key=lambda row: row.distance_m)
+
+def _get_active_checkin_map():
+    """
+    Map employee -> latest IN checkin of today.
+    """
     today = getdate(now_datetime())
     start_of_day = datetime.combine(today, time.min)
     end_of_day = datetime.combine(today, time.max)
-    results = []
 
     checkin_filters = {
         "log_type": "IN",
@@ -124,74 +647,312 @@ def get_latest_locations(on_duty_only=True):
         if ci.employee not in active_checkin_map:
             active_checkin_map[ci.employee] = ci.name
 
-    if on_duty_only and not active_checkin_map:
-        return create_response(data=[])
-
-    tech_filters = {}
-    if on_duty_only:
-        tech_filters["employee_id"] = ["in", list(active_checkin_map.keys())]
-    
-    technicians = frappe.get_all("Technician", fields=["name", "employee_id", "technician_name"], filters=tech_filters)
-
-    for tech in technicians:
-        checkin_name = active_checkin_map.get(tech.employee_id)
-
-        if on_duty_only and not checkin_name:
-            continue
-            
-        loc_filters = {"technician": tech.name}
-        if on_duty_only:
-             # Strict: Only show location from CURRENT active shift
-             loc_filters["employee_checkin"] = checkin_name
-
-        last_loc = frappe.db.get_value(
-            "Technician Location Log",
-            loc_filters,
-            ["latitude", "longitude", "captured_at"],
-            order_by="captured_at desc",
-            as_dict=True,
-        )
-
-        if last_loc:
-            results.append({
-                "technician": tech.name,
-                "technician_name": tech.technician_name,
-                "latitude": last_loc.latitude,
-                "longitude": last_loc.longitude,
-                "captured_at": last_loc.captured_at,
-            })
-            
-    return create_response(data=results, meta={"count": len(results)})
+    return active_checkin_map
 
 @frappe.whitelist()
-def get_route(technician, date=None, employee_checkin=None):
+def get_route(technician, date=None, employee_checkin=None, cursor=None, limit=None, tolerance=None, zoom=None, format="json"):
     """
     Get ordered route points.
+
+    Results are paged with a keyset cursor: pass `meta.next_cursor` back as
+    `cursor` until it is empty. Days whose raw rows were purged are read from
+    `Technician Route Archive`. `tolerance` (meters) or `zoom` (web-map zoom
+    level) simplifies each page server-side, and `format="polyline"` returns
+    the page as an encoded polyline instead of point objects.
     """
-    filters = {"technician": technician}
-    
+    frappe.has_permission("Technician Location Log", "read", throw=True)
+
+    limit = min(cint(limit) or ROUTE_PAGE_SIZE, MAX_ROUTE_PAGE_SIZE)
+    from_time = to_time = None
+
     if employee_checkin:
-        filters["employee_checkin"] = employee_checkin
+        checkin_time = frappe.db.get_value("Employee Checkin", employee_checkin, "time")
+        if not checkin_time:
+            return create_response(success=False, code=NOT_FOUND, message=f"Employee Checkin {employee_checkin} not found")
+        checkin_date = getdate(checkin_time)
+        from_time, to_time = datetime.combine(checkin_date, time.min), datetime.combine(checkin_date, time.max)
     elif date:
         # Filter by date range `captured_at`
-        filters["captured_at"] = ["between", [f"{date} 00:00:00", f"{date} 23:59:59"]]
-    
-    points = frappe.get_all("Technician Location Log",
+        from_time, to_time = datetime.combine(getdate(date), time.min), datetime.combine(getdate(date), time.max)
+
+    after = None
+    if cursor:
+        after = _decode_cursor(cursor)
+        if not after:
+            return create_response(success=False, code=VALIDATION_ERROR, message="Invalid cursor")
+
+    points = _fetch_route_page(technician, from_time, to_time, employee_checkin, after, limit + 1)
+
+    next_cursor = None
+    if len(points) > limit:
+        points = points[:limit]
+        next_cursor = _encode_cursor(points[-1])
+
+    meta = {"raw_count": len(points), "next_cursor": next_cursor}
+
+    if points and (tolerance or zoom):
+        if not tolerance:
+            tolerance = zoom_to_tolerance(flt(zoom), points[0].latitude)
+        points = simplify(points, flt(tolerance))
+        meta["tolerance"] = flt(tolerance)
+
+    for point in points:
+        point.pop("name", None)
+
+    meta["count"] = len(points)
+
+    if format == "polyline":
+        data = {
+            "polyline": encode_polyline([(p.latitude, p.longitude) for p in points]),
+            "start": points[0].captured_at if points else None,
+            "end": points[-1].captured_at if points else None,
+        }
+        return create_response(data=data, meta=meta)
+
+    return create_response(data=points, meta=meta)
+
+def _fetch_route_page(technician, from_time=None, to_time=None, employee_checkin=None, after=None, limit=ROUTE_PAGE_SIZE):
+    """
+    Up to `limit` valid points ordered by (captured_at, name), starting after
+    the `after` key. Days older than the first raw row only survive as
+    compacted archives and are read from there.
+    """
+    points = []
+    raw_start = frappe.db.get_value("Technician Location Log", {"technician": technician}, "captured_at", order_by="captured_at asc")
+    # Once the cursor has reached the raw rows, archives have nothing left to add.
+    in_archive_range = not raw_start or not from_time or from_time < raw_start
+    if in_archive_range and not (raw_start and after and after[0] >= raw_start):
+        points = location_compaction.get_archived_points(
+            technician, raw_start, from_time, to_time, employee_checkin, after, limit
+        )
+        for point in points:
+            point.pop("employee_checkin", None)
+            point.pop("accuracy", None)
+
+    if not raw_start or len(points) >= limit:
+        return points
+
+    conditions = ["technician = %(technician)s", "is_valid = 1"]
+    params = {"technician": technician, "limit": limit - len(points)}
+    if employee_checkin:
+        conditions.append("employee_checkin = %(employee_checkin)s")
+        params["employee_checkin"] = employee_checkin
+    if from_time:
+        conditions.append("captured_at >= %(from_time)s")
+        params["from_time"] = from_time
+    if to_time:
+        conditions.append("captured_at <= %(to_time)s")
+        params["to_time"] = to_time
+    if after:
+        conditions.append("(captured_at > %(after_time)s OR (captured_at = %(after_time)s AND name > %(after_name)s))")
+        params["after_time"], params["after_name"] = after
+
+    points += frappe.db.sql(f"""
+        SELECT name, latitude, longitude, captured_at, speed, heading
+        FROM `tabTechnician Location Log`
+        WHERE {" AND ".join(conditions)}
+        ORDER BY captured_at ASC, name ASC
+        LIMIT %(limit)s
+    """, params, as_dict=True)
+
+    return points
+
+def iter_route_points(technician, from_time=None, to_time=None, page_size=ROUTE_PAGE_SIZE):
+    """
+    Iterate every valid point in the range, one keyset page in memory at a time.
+    """
+    # Checked here rather than in the generator so callers fail before streaming.
+    frappe.has_permission("Technician Location Log", "read", throw=True)
+    return _iter_route_pages(technician, from_time, to_time, page_size)
+
+def _iter_route_pages(technician, from_time, to_time, page_size):
+    after = None
+    while True:
+        page = _fetch_route_page(technician, from_time, to_time, after=after, limit=page_size)
+        yield from page
+        if len(page) < page_size:
+            break
+        after = (page[-1].captured_at, page[-1].name)
+
+def _encode_cursor(point):
+    raw = f"{point.captured_at}|{point.name}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        captured_at, name = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return get_datetime(captured_at), name
+    except Exception:
+        return None
+
+@frappe.whitelist()
+def get_history_route(technician, month, from_time=None, to_time=None, columns=None):
+    """
+    Replay a technician's route from the columnar monthly history archive.
+
+    `month` is "YYYY-MM"; `columns` (JSON list or comma separated) limits the
+    fields read, e.g. ["captured_at", "latitude", "longitude"].
+    """
+    frappe.has_permission("Technician Location Log", "read", throw=True)
+
+    if isinstance(columns, str):
+        try:
+            columns = json.loads(columns) if columns.startswith("[") else columns.split(",")
+        except ValueError:
+            return create_response(success=False, code=VALIDATION_ERROR, message="columns must be a JSON list or comma separated")
+    if not all(isinstance(c, str) for c in columns or ()):
+        return create_response(success=False, code=VALIDATION_ERROR, message="columns must be a list of column names")
+    columns = [c.strip() for c in columns or ("captured_at", "latitude", "longitude")]
+
+    unknown = set(columns) - set(location_history.COLUMNS)
+    if unknown:
+        return create_response(success=False, code=VALIDATION_ERROR, message=f"Unknown columns: {', '.join(sorted(unknown))}")
+
+    try:
+        history = location_history.MonthHistory(month)
+    except FileNotFoundError as e:
+        return create_response(success=False, code=NOT_FOUND, message=str(e))
+
+    try:
+        points = history.replay(
+            technician,
+            columns,
+            get_datetime(from_time) if from_time else None,
+            get_datetime(to_time) if to_time else None,
+        )
+    finally:
+        history.close()
+
+    return create_response(data=points, meta={"count": len(points), "month": month})
+
+@frappe.whitelist()
+def get_history_fleet_stats(month):
+    """
+    Point count and distance per technician for an archived month.
+    """
+    frappe.has_permission("Technician Location Log", "read", throw=True)
+
+    try:
+        history = location_history.MonthHistory(month)
+    except FileNotFoundError as e:
+        return create_response(success=False, code=NOT_FOUND, message=str(e))
+
+    try:
+        data = history.fleet_stats()
+    finally:
+        history.close()
+
+    return create_response(data=data, meta={"count": len(data), "month": month})
+
+@frappe.whitelist()
+def get_distance_summary(technician=None, period=None, from_date=None, to_date=None, group_by="day"):
+    """
+    Pre-computed distance and moving time per technician.
+
+    `period` is today (default), week or month; `from_date`/`to_date` override
+    it. `group_by="checkin"` returns one row per checkin instead of per day.
+    """
+    frappe.has_permission("Technician Distance Summary", "read", throw=True)
+
+    if not (from_date and to_date):
+        to_date = getdate(now_datetime())
+        if period == "week":
+            from_date = get_first_day_of_week(to_date)
+        elif period == "month":
+            from_date = to_date.replace(day=1)
+        else:
+            from_date = to_date
+
+    conditions = ["date BETWEEN %(from_date)s AND %(to_date)s"]
+    params = {"from_date": from_date, "to_date": to_date}
+    if technician:
+        conditions.append("technician = %(technician)s")
+        params["technician"] = technician
+
+    group_columns = "technician, date, employee_checkin" if group_by == "checkin" else "technician, date"
+
+    data = frappe.db.sql(f"""
+        SELECT {group_columns}, MAX(technician_name) AS technician_name,
+            ROUND(SUM(distance_km), 3) AS distance_km,
+            SUM(moving_seconds) AS moving_seconds,
+            SUM(point_count) AS point_count
+        FROM `tabTechnician Distance Summary`
+        WHERE {" AND ".join(conditions)}
+        GROUP BY {group_columns}
+        ORDER BY date DESC, distance_km DESC
+    """, params, as_dict=True)
+
+    return create_response(data=data, meta={"count": len(data), "from_date": from_date, "to_date": to_date})
+
+@frappe.whitelist()
+def get_dwells(technician=None, date=None, complain=None):
+    """
+    Detected stops for a technician and day, or every stop matched to a complaint.
+    `meta.on_site_seconds` totals their duration.
+    """
+    if not (complain or (technician and date)):
+        return create_response(success=False, code=VALIDATION_ERROR, message="Pass complain, or technician and date")
+
+    filters = {"complain": complain} if complain else {"technician": technician, "date": getdate(date)}
+    data = frappe.get_all(
+        "Technician Dwell",
         filters=filters,
-        fields=["latitude", "longitude", "captured_at", "speed", "heading"],
-        order_by="captured_at asc",
-        limit=5000 
+        fields=[
+            "name", "technician", "technician_name", "employee_checkin", "start_time", "end_time",
+            "duration_seconds", "point_count", "latitude", "longitude", "complain", "is_open",
+        ],
+        order_by="start_time asc",
     )
-    
-    return create_response(data=points, meta={"count": len(points)})
+
+    return create_response(data=data, meta={"count": len(data), "on_site_seconds": sum(d.duration_seconds or 0 for d in data)})
 
 @frappe.whitelist()
-def get_distance_summary(technician=None, period=None):
+def get_heatmap(min_lat, min_lon, max_lat, max_lon, from_date, to_date, precision=None):
     """
-    Placeholder for pre-computed distance summary.
+    Aggregated heatmap cells inside a bounding box for a date range.
+
+    `precision` (geohash length, up to the rollup's 7) merges cells for
+    coarser zoom levels; totals are summed over the range.
     """
-    # This implies a separate summary table exists or we compute on fly.
-    # Instruction says "No live computation".
-    # Since we haven't built the summarizer yet, return empty.
-    
-    return create_response(data=[])
+    frappe.has_permission("Location Heatmap Cell", "read", throw=True)
+
+    precision = min(cint(precision) or location_heatmap.CELL_PRECISION, location_heatmap.CELL_PRECISION)
+    if precision < 1:
+        return create_response(success=False, code=VALIDATION_ERROR, message="precision must be between 1 and 7")
+
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    if from_date > to_date:
+        return create_response(success=False, code=VALIDATION_ERROR, message="From Date must be before To Date")
+
+    cells = frappe.db.sql("""
+        SELECT LEFT(geohash, %(precision)s) AS geohash,
+            SUM(point_count) AS point_count,
+            SUM(dwell_seconds) AS dwell_seconds,
+            MAX(technician_count) AS technician_count
+        FROM `tabLocation Heatmap Cell`
+        WHERE date BETWEEN %(from_date)s AND %(to_date)s
+        AND latitude BETWEEN %(min_lat)s AND %(max_lat)s
+        AND longitude BETWEEN %(min_lon)s AND %(max_lon)s
+        GROUP BY LEFT(geohash, %(precision)s)
+        ORDER BY point_count DESC
+        LIMIT %(limit)s
+    """, {
+        "precision": precision,
+        "from_date": from_date,
+        "to_date": to_date,
+        "min_lat": flt(min_lat),
+        "max_lat": flt(max_lat),
+        "min_lon": flt(min_lon),
+        "max_lon": flt(max_lon),
+        "limit": MAX_HEATMAP_CELLS + 1,
+    }, as_dict=True)
+
+    truncated = len(cells) > MAX_HEATMAP_CELLS
+    cells = cells[:MAX_HEATMAP_CELLS]
+    for cell in cells:
+        cell.latitude, cell.longitude = location_heatmap.cell_centre(cell.geohash)
+
+    return create_response(
+        data=cells,
+        meta={"count": len(cells), "precision": precision, "truncated": truncated, "from_date": from_date, "to_date": to_date},
+    )
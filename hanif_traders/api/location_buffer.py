@@ -0,0 +1,195 @@
+"""Write-behind buffer for `Technician Location Log` rows.
+
+In Buffered ingest mode points are appended to a Redis list and the request
+returns at once. `flush_buffer` drains the list in bulk inserts; it is
+enqueued when the list reaches the flush size and polled every minute by
+the scheduler for the flush interval. When Redis is unreachable the rows are
+written before the request returns, as in Direct mode, so an acknowledged
+point is never held only in a worker's memory.
+"""
+
+import json
+import time
+
+import frappe
+from frappe.utils import cint, get_datetime
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from hanif_traders.api.response import create_response
+
+BUFFER_KEY = "technician_location_buffer"
+DEAD_LETTER_KEY = "technician_location_buffer_failed"
+LAST_FLUSH_KEY = "technician_location_buffer_last_flush"
+COUNTER_KEYS = ("enqueued", "flushed", "rejected", "failed", "flushes")
+DATETIME_FIELDS = ("creation", "modified", "captured_at", "received_at")
+FLUSH_JOB_ID = "technician_location_buffer_flush"
+FLUSH_LOCK_KEY = "technician_location_buffer_lock"
+
+
+def get_buffer_settings():
+    settings = frappe.get_cached_doc("Complain Settings")
+    return frappe._dict({
+        "enabled": settings.location_ingest_mode == "Buffered",
+        "flush_size": cint(settings.location_buffer_flush_size) or 500,
+        "flush_interval": cint(settings.location_buffer_flush_interval) or 60,
+        "max_size": cint(settings.location_buffer_max_size) or 50000,
+    })
+
+
+def is_enabled():
+    return get_buffer_settings().enabled
+
+
+def get_load():
+    """
+    Fraction (0..1) of the buffer capacity in use; 0 in Direct mode.
+    """
+    settings = get_buffer_settings()
+    if not settings.enabled:
+        return 0.0
+
+    try:
+        depth = frappe.cache().llen(BUFFER_KEY)
+    except RedisConnectionError:
+        return 0.0
+    return min(1.0, depth / settings.max_size)
+
+
+def enqueue_rows(rows):
+    """
+    Append rows to the buffer. Returns False (and writes nothing) when the buffer is full.
+    """
+    settings = get_buffer_settings()
+    payload = [json.dumps(row, default=str, separators=(",", ":")) for row in rows]
+
+    try:
+        depth = frappe.cache().llen(BUFFER_KEY)
+        if depth + len(payload) > settings.max_size:
+            _incr("rejected", len(payload))
+            return False
+
+        frappe.cache().pipeline().rpush(_key(BUFFER_KEY), *payload).execute()
+        _incr("enqueued", len(payload))
+    except RedisConnectionError:
+        from hanif_traders.api.location import write_log_rows
+
+        write_log_rows(rows, defer_derived=True)
+        return True
+
+    if depth + len(payload) >= settings.flush_size:
+        frappe.enqueue(
+            "hanif_traders.api.location_buffer.flush_buffer",
+            queue="short",
+            job_id=FLUSH_JOB_ID,
+            deduplicate=True,
+            enqueue_after_commit=True,
+        )
+    return True
+
+
+def flush_if_due():
+    """
+    Scheduler hook: flush when the interval has elapsed since the last flush.
+    """
+    settings = get_buffer_settings()
+    try:
+        last_flush = float(frappe.cache().get_value(LAST_FLUSH_KEY) or 0)
+        if not frappe.cache().llen(BUFFER_KEY):
+            return
+    except RedisConnectionError:
+        return
+
+    if time.time() - last_flush >= settings.flush_interval:
+        flush_buffer()
+
+
+def flush_buffer():
+    """
+    Drain the Redis buffer in chunks of `flush_size`, one bulk insert per chunk.
+    """
+    settings = get_buffer_settings()
+    cache = frappe.cache()
+
+    # The enqueued job and the scheduler poll may overlap; only one drains.
+    if not cache.set(_key(FLUSH_LOCK_KEY), 1, nx=True, ex=300):
+        return
+
+    try:
+        cache.set_value(LAST_FLUSH_KEY, time.time())
+        while True:
+            chunk = cache.lrange(BUFFER_KEY, 0, settings.flush_size - 1)
+            if not chunk:
+                break
+
+            _write_chunk(chunk)
+            # Producers only append to the tail, so trimming the head is safe.
+            cache.ltrim(BUFFER_KEY, len(chunk), -1)
+
+            if len(chunk) < settings.flush_size:
+                break
+    finally:
+        cache.delete(_key(FLUSH_LOCK_KEY))
+
+
+def _write_chunk(chunk):
+    from hanif_traders.api.location import write_log_rows
+
+    rows = [_decode(item) for item in chunk]
+    try:
+        write_log_rows(rows)
+        frappe.db.commit()
+        _incr("flushed", len(rows))
+        _incr("flushes")
+    except Exception:
+        frappe.db.rollback()
+        frappe.log_error(title="Location Buffer Flush Error", message=frappe.get_traceback())
+        # Park the chunk so one bad row cannot block the queue.
+        try:
+            frappe.cache().pipeline().rpush(_key(DEAD_LETTER_KEY), *chunk).execute()
+        except RedisConnectionError:
+            pass
+        _incr("failed", len(rows))
+
+
+def _decode(item):
+    row = frappe._dict(json.loads(item))
+    for field in DATETIME_FIELDS:
+        if row.get(field):
+            row[field] = get_datetime(row[field])
+    return row
+
+
+def _key(name):
+    return frappe.cache().make_key(name)
+
+
+def _counter_key(name):
+    return _key(f"{BUFFER_KEY}:{name}")
+
+
+def _incr(name, amount=1):
+    try:
+        frappe.cache().incrby(_counter_key(name), amount)
+    except RedisConnectionError:
+        pass
+
+
+@frappe.whitelist()
+def get_buffer_stats():
+    """
+    Queue depth and lifetime counters for the location buffer.
+    """
+    frappe.only_for("System Manager")
+
+    cache = frappe.cache()
+    data = dict(get_buffer_settings())
+    try:
+        data["depth"] = cache.llen(BUFFER_KEY)
+        data["failed_depth"] = cache.llen(DEAD_LETTER_KEY)
+        data["last_flush"] = cache.get_value(LAST_FLUSH_KEY)
+        for name in COUNTER_KEYS:
+            data[name] = cint(cache.get(_counter_key(name)))
+    except RedisConnectionError:
+        data["redis_available"] = False
+
+    return create_response(data=data)
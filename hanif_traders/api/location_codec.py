@@ -0,0 +1,156 @@
+"""Compact upload format for `ingest_batch`.
+
+The payload is base64 text of (optionally gzip-compressed) bytes:
+
+    version     1 byte, currently 1
+    header      varints: point count, base time (epoch ms, UTC),
+                base latitude and base longitude (zigzag, degrees x 1e6)
+    columns     `count` varints per column, in this order:
+                time delta (ms, zigzag), latitude delta, longitude delta
+                (zigzag, x 1e6), accuracy (m), speed (dm/s), heading (deg)
+
+Deltas are taken from the previous point (the base for the first one).
+Accuracy, speed and heading are stored as value + 1 so that 0 means
+"not reported". Columns are decoded whole with running sums, so the
+decoder touches each value once.
+"""
+
+import base64
+import zlib
+from datetime import datetime, timezone
+from itertools import accumulate
+
+from frappe.utils import convert_utc_to_system_timezone
+
+FORMAT_VERSION = 1
+COORDINATE_SCALE = 10 ** 6
+SPEED_SCALE = 10
+# Refuse payloads that inflate beyond this, whatever their compressed size.
+MAX_PAYLOAD_BYTES = 1024 * 1024
+
+
+class PayloadError(ValueError):
+    pass
+
+
+def decode_payload(payload, compression=None):
+    """
+    Decode a compact payload into point dicts accepted by `_parse_point`.
+    """
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except ValueError:
+        raise PayloadError("Payload is not valid base64")
+
+    if compression == "gzip":
+        inflater = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        try:
+            data = inflater.decompress(data, MAX_PAYLOAD_BYTES)
+        except zlib.error:
+            raise PayloadError("Payload is not valid gzip")
+        if inflater.unconsumed_tail:
+            raise PayloadError("Payload is too large")
+    elif compression:
+        raise PayloadError(f"Unsupported compression: {compression}")
+
+    if not data or data[0] != FORMAT_VERSION:
+        raise PayloadError("Unsupported payload version")
+
+    values = _read_varints(data, 1)
+    if len(values) < 4:
+        raise PayloadError("Truncated payload header")
+
+    count = values[0]
+    base_time, base_lat, base_lon = values[1], _unzigzag(values[2]), _unzigzag(values[3])
+    body = values[4:]
+    if len(body) != count * 6:
+        raise PayloadError("Payload does not match its point count")
+
+    columns = [body[i * count:(i + 1) * count] for i in range(6)]
+    times = accumulate((_unzigzag(v) for v in columns[0]), initial=base_time)
+    lats = accumulate((_unzigzag(v) for v in columns[1]), initial=base_lat)
+    lons = accumulate((_unzigzag(v) for v in columns[2]), initial=base_lon)
+    # Drop the base values that `initial` puts first.
+    times, lats, lons = list(times)[1:], list(lats)[1:], list(lons)[1:]
+
+    return [
+        {
+            "captured_at": _to_system_time(times[i]),
+            "latitude": lats[i] / COORDINATE_SCALE,
+            "longitude": lons[i] / COORDINATE_SCALE,
+            "accuracy": _optional(columns[3][i]),
+            "speed": _optional(columns[4][i], SPEED_SCALE),
+            "heading": _optional(columns[5][i]),
+        }
+        for i in range(count)
+    ]
+
+
+def encode_payload(points, compression=None):
+    """
+    Reference encoder (mirrors the mobile client). `points` carry
+    `timestamp` (epoch ms, UTC), latitude, longitude and optional
+    accuracy/speed/heading.
+    """
+    times = [int(p["timestamp"]) for p in points]
+    lats = [round(p["latitude"] * COORDINATE_SCALE) for p in points]
+    lons = [round(p["longitude"] * COORDINATE_SCALE) for p in points]
+    base = (times[0], lats[0], lons[0]) if points else (0, 0, 0)
+
+    values = [len(points), base[0], _zigzag(base[1]), _zigzag(base[2])]
+    for column, start in ((times, base[0]), (lats, base[1]), (lons, base[2])):
+        values.extend(_zigzag(b - a) for a, b in zip([start, *column], column, strict=False))
+    values.extend(_encode_optional(p.get("accuracy")) for p in points)
+    values.extend(_encode_optional(p.get("speed"), SPEED_SCALE) for p in points)
+    values.extend(_encode_optional(p.get("heading")) for p in points)
+
+    data = bytes([FORMAT_VERSION]) + b"".join(_write_varint(v) for v in values)
+    if compression == "gzip":
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+        data = compressor.compress(data) + compressor.flush()
+    return base64.b64encode(data).decode()
+
+
+def _read_varints(data, offset):
+    values = []
+    value = shift = 0
+    for byte in data[offset:]:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+    if shift:
+        raise PayloadError("Truncated varint")
+    return values
+
+
+def _write_varint(value):
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def _encode_optional(value, scale=1):
+    return 0 if value is None else max(0, round(value * scale)) + 1
+
+
+def _optional(value, scale=1):
+    return None if not value else (value - 1) / scale
+
+
+def _to_system_time(epoch_ms):
+    utc = datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+    return convert_utc_to_system_timezone(utc).replace(tzinfo=None)
@@ -0,0 +1,230 @@
+"""Daily compaction of `Technician Location Log` into `Technician Route Archive`.
+
+Each closed day of a technician's valid points is folded into one archive
+row (polyline plus delta-encoded columns). Raw rows older than the
+retention window are then deleted; `get_route` reads archived days through
+`get_archived_points`.
+"""
+
+import json
+from datetime import datetime, time, timedelta
+
+import frappe
+from frappe.utils import add_days, cint, flt, get_datetime, getdate, now_datetime, today
+
+from hanif_traders.api.geo import decode_integers, decode_polyline, encode_integers, encode_polyline
+from hanif_traders.api.location_summary import summarize
+
+POLYLINE_PRECISION = 6
+DELETE_CHUNK_SIZE = 10000
+# Sentinel for missing speed/heading/accuracy in the encoded columns.
+MISSING = -1
+# Columns decode_archive reads.
+ARCHIVE_FIELDS = (
+    "name", "start_time", "polyline", "time_offsets", "speeds", "headings", "accuracies", "checkin_segments",
+)
+
+
+def compact_closed_days():
+    """
+    Scheduler hook: archive every closed day that still has raw rows, then
+    apply the retention window.
+    """
+    start_of_today = datetime.combine(getdate(today()), time.min)
+
+    days = frappe.db.sql("""
+        SELECT technician, DATE(captured_at) AS date, COUNT(*) AS point_count
+        FROM `tabTechnician Location Log`
+        WHERE captured_at < %s AND is_valid = 1
+        GROUP BY technician, DATE(captured_at)
+    """, (start_of_today,), as_dict=True)
+
+    if not days:
+        purge_expired_rows()
+        return
+
+    archived = {
+        (d.technician, getdate(d.date)): d.point_count
+        for d in frappe.get_all(
+            "Technician Route Archive",
+            filters={"date": [">=", min(getdate(d.date) for d in days)]},
+            fields=["technician", "date", "point_count"],
+        )
+    }
+
+    for day in days:
+        # Backlog uploads can add points to an already archived day; re-fold it.
+        if archived.get((day.technician, getdate(day.date))) == day.point_count:
+            continue
+        compact_day(day.technician, day.date)
+        frappe.db.commit()
+
+    purge_expired_rows()
+
+
+def compact_day(technician, date):
+    """
+    Fold one technician-day of valid points into its `Technician Route Archive` row.
+    """
+    date = getdate(date)
+    points = frappe.get_all(
+        "Technician Location Log",
+        filters={
+            "technician": technician,
+            "is_valid": 1,
+            "captured_at": ["between", [datetime.combine(date, time.min), datetime.combine(date, time.max)]],
+        },
+        fields=["technician_name", "employee_checkin", "latitude", "longitude", "captured_at", "speed", "heading", "accuracy"],
+        order_by="captured_at asc",
+    )
+    if not points:
+        return None
+
+    name = frappe.db.get_value("Technician Route Archive", {"technician": technician, "date": date}, "name")
+    archive = frappe.get_doc("Technician Route Archive", name) if name else frappe.new_doc("Technician Route Archive")
+    archive.update(encode_points(points))
+    archive.technician = technician
+    archive.technician_name = points[0].technician_name
+    archive.date = date
+    archive.distance_km = round(summarize(points)[0] / 1000, 3)
+    archive.save(ignore_permissions=True)
+    return archive.name
+
+
+def encode_points(points):
+    """
+    Encode time-ordered points into the archive's column fields.
+    """
+    start_time = get_datetime(points[0].captured_at)
+    segments = []
+    for index, point in enumerate(points):
+        if not segments or segments[-1][0] != point.employee_checkin:
+            segments.append([point.employee_checkin, index])
+
+    return {
+        "point_count": len(points),
+        "start_time": start_time,
+        "end_time": points[-1].captured_at,
+        "polyline": encode_polyline([(p.latitude, p.longitude) for p in points], POLYLINE_PRECISION),
+        "time_offsets": encode_integers(
+            [round((get_datetime(p.captured_at) - start_time).total_seconds() * 1000) for p in points]
+        ),
+        "speeds": encode_integers([_encode_optional(p.speed, 10) for p in points]),
+        "headings": encode_integers([_encode_optional(p.heading) for p in points]),
+        "accuracies": encode_integers([_encode_optional(p.accuracy) for p in points]),
+        "checkin_segments": json.dumps(segments),
+    }
+
+
+def decode_archive(archive):
+    """
+    Expand an archive row back into point dicts shaped like log rows.
+    """
+    coordinates = decode_polyline(archive.polyline or "", POLYLINE_PRECISION)
+    offsets = decode_integers(archive.time_offsets or "")
+    speeds = decode_integers(archive.speeds or "")
+    headings = decode_integers(archive.headings or "")
+    accuracies = decode_integers(archive.accuracies or "")
+    start_time = get_datetime(archive.start_time)
+
+    checkins = [None] * len(coordinates)
+    segments = json.loads(archive.checkin_segments or "[]")
+    for i, (checkin, first) in enumerate(segments):
+        last = segments[i + 1][1] if i + 1 < len(segments) else len(coordinates)
+        checkins[first:last] = [checkin] * (last - first)
+
+    return [
+        frappe._dict({
+            # Synthetic names keep (captured_at, name) cursors unique within a day.
+            "name": f"{archive.name}:{i:06d}",
+            "employee_checkin": checkins[i],
+            "latitude": lat,
+            "longitude": lon,
+            "captured_at": start_time + timedelta(milliseconds=offsets[i]),
+            "speed": _decode_optional(speeds[i], 10),
+            "heading": _decode_optional(headings[i]),
+            "accuracy": _decode_optional(accuracies[i]),
+        })
+        for i, (lat, lon) in enumerate(coordinates)
+    ]
+
+
+def get_archived_points(technician, before, from_time=None, to_time=None, employee_checkin=None, after=None, limit=None):
+    """
+    Points from archives for `technician` captured before `before` (the
+    first raw row still on disk), ordered by (captured_at, name).
+
+    Archives are decoded one day at a time, starting at the `after` cursor's
+    day, and reading stops as soon as `limit` points are collected.
+    """
+    start_dates = [getdate(value) for value in (from_time, after[0] if after else None) if value]
+    start_date = max(start_dates) if start_dates else None
+    end_dates = [getdate(value) for value in (before, to_time) if value]
+    end_date = min(end_dates) if end_dates else None
+
+    filters = {"technician": technician}
+    if start_date and end_date:
+        filters["date"] = ["between", [start_date, end_date]]
+    elif start_date:
+        filters["date"] = [">=", start_date]
+    elif end_date:
+        filters["date"] = ["<=", end_date]
+
+    points = []
+    for name in frappe.get_all("Technician Route Archive", filters=filters, order_by="date asc", pluck="name"):
+        archive = frappe.db.get_value("Technician Route Archive", name, ARCHIVE_FIELDS, as_dict=True)
+        for point in decode_archive(archive):
+            if before and point.captured_at >= before:
+                break
+            if from_time and point.captured_at < from_time:
+                continue
+            if to_time and point.captured_at > to_time:
+                break
+            if employee_checkin and point.employee_checkin != employee_checkin:
+                continue
+            if after and (point.captured_at, point.name) <= after:
+                continue
+            points.append(point)
+            if limit and len(points) >= limit:
+                return points
+
+    return points
+
+
+def purge_expired_rows():
+    """
+    Delete raw log rows older than the retention window whose day is archived.
+    """
+    retention_days = cint(frappe.get_cached_doc("Complain Settings").location_retention_days)
+    if retention_days <= 0:
+        return
+
+    cutoff = datetime.combine(add_days(getdate(today()), -retention_days), time.min)
+    oldest_unarchived = frappe.db.sql("""
+        SELECT MIN(log.captured_at)
+        FROM `tabTechnician Location Log` log
+        LEFT JOIN `tabTechnician Route Archive` archive
+            ON archive.technician = log.technician AND archive.date = DATE(log.captured_at)
+        WHERE log.captured_at < %s AND log.is_valid = 1 AND archive.name IS NULL
+    """, (cutoff,))[0][0]
+    if oldest_unarchived:
+        # Never drop a day that has not been folded yet.
+        cutoff = min(cutoff, datetime.combine(getdate(oldest_unarchived), time.min))
+
+    while True:
+        frappe.db.sql(
+            "DELETE FROM `tabTechnician Location Log` WHERE captured_at < %s LIMIT %s",
+            (cutoff, DELETE_CHUNK_SIZE),
+        )
+        deleted = frappe.db.sql("SELECT ROW_COUNT()")[0][0]
+        frappe.db.commit()
+        if deleted < DELETE_CHUNK_SIZE:
+            break
+
+
+def _encode_optional(value, scale=1):
+    return MISSING if value is None else max(0, round(flt(value) * scale))
+
+
+def _decode_optional(value, scale=1):
+    return None if value == MISSING else value / scale if scale != 1 else value
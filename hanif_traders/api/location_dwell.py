@@ -0,0 +1,236 @@
+"""Streaming stop (dwell) detection over the location stream.
+
+Consecutive slow points that stay within `DWELL_RADIUS` of their running
+centroid form a candidate episode. The candidate for each technician lives
+in the cache, so each written batch only extends it. Once it lasts
+`MIN_DWELL_SECONDS` it is saved as an open `Technician Dwell`. When the
+technician leaves, or stops reporting for `MAX_GAP_SECONDS`, the dwell is
+closed with its final centroid and duration and matched to the complaint
+being worked on. `rebuild_closed_day` recomputes yesterday nightly, which
+also picks up points that arrived out of order.
+"""
+
+from datetime import datetime, time, timedelta
+
+import frappe
+from frappe.utils import add_to_date, flt, get_datetime, getdate, now_datetime, today
+
+from hanif_traders.api import location_heatmap
+from hanif_traders.api.geo import haversine
+
+DWELL_RADIUS = 75  # meters
+MIN_DWELL_SECONDS = 300
+MAX_GAP_SECONDS = 900
+# Points reporting more than this (m/s) are driving past, not stopped.
+DWELL_MAX_SPEED = 1.5
+# A complaint resolved this long after the technician left still counts as this visit.
+RESOLUTION_GRACE = timedelta(minutes=30)
+CANDIDATE_KEY = "technician_dwell_candidate"
+RESOLVED_STATES = ("Resolved", "CSC Verified", "Closed")
+
+
+def update_dwells(rows):
+    """
+    Extend each technician's candidate with freshly written valid rows.
+    """
+    groups = {}
+    for row in rows:
+        if row.get("is_valid", 1):
+            groups.setdefault(row.technician, []).append(row)
+
+    cache = frappe.cache()
+    for technician, points in groups.items():
+        key = f"{CANDIDATE_KEY}:{technician}"
+        state = _load_state(cache.get_value(key))
+        for point in sorted(points, key=lambda p: p.captured_at):
+            # Older points are left to the nightly rebuild.
+            if state and point.captured_at <= state.end:
+                continue
+            state, closed = fold(state, point)
+            if closed:
+                _save_dwell(closed, is_open=False)
+            if state.duration >= MIN_DWELL_SECONDS and not state.dwell:
+                state.dwell = _save_dwell(state, is_open=True)
+
+        cache.set_value(key, _dump_state(state), expires_in_sec=86400)
+
+
+def fold(state, point):
+    """
+    Add one time-ordered point. Returns (state, closed) where `closed` is the
+    previous candidate when this point ends it, else None.
+    """
+    speed = flt(point.speed) if point.get("speed") is not None else None
+    if state and (point.captured_at - state.end).total_seconds() <= MAX_GAP_SECONDS and (speed is None or speed <= DWELL_MAX_SPEED):
+        if haversine(state.latitude, state.longitude, point.latitude, point.longitude) <= DWELL_RADIUS:
+            state.point_count += 1
+            # Running centroid.
+            state.latitude += (point.latitude - state.latitude) / state.point_count
+            state.longitude += (point.longitude - state.longitude) / state.point_count
+            state.end = point.captured_at
+            state.duration = (state.end - state.start).total_seconds()
+            return state, None
+
+    closed = state if state and state.duration >= MIN_DWELL_SECONDS else None
+    return _new_state(point), closed
+
+
+def close_stale_dwells():
+    """
+    Scheduler hook: close open dwells whose technician stopped reporting.
+    """
+    cutoff = add_to_date(now_datetime(), seconds=-MAX_GAP_SECONDS)
+    cache = frappe.cache()
+    for dwell in frappe.get_all(
+        "Technician Dwell",
+        filters={"is_open": 1, "end_time": ["<", cutoff]},
+        fields=["name", "technician"],
+    ):
+        key = f"{CANDIDATE_KEY}:{dwell.technician}"
+        state = _load_state(cache.get_value(key))
+        if state and state.dwell == dwell.name:
+            _save_dwell(state, is_open=False)
+            cache.delete_value(key)
+        else:
+            # Candidate expired from the cache; keep the last saved extent.
+            doc = frappe.get_doc("Technician Dwell", dwell.name)
+            doc.is_open = 0
+            doc.complain = match_complaint(doc.technician, doc.start_time, doc.end_time)
+            doc.save(ignore_permissions=True)
+        frappe.db.commit()
+
+
+def rebuild_closed_day(date=None):
+    """
+    Scheduler hook: recompute every closed dwell of a day (default yesterday) from raw points.
+    """
+    date = getdate(date) if date else getdate(today()) - timedelta(days=1)
+    from_time, to_time = datetime.combine(date, time.min), datetime.combine(date, time.max)
+
+    technicians = frappe.db.sql_list("""
+        SELECT DISTINCT technician FROM `tabTechnician Location Log`
+        WHERE captured_at BETWEEN %s AND %s AND is_valid = 1
+    """, (from_time, to_time))
+
+    for technician in technicians:
+        rebuild_dwells(technician, from_time, to_time)
+        frappe.db.commit()
+
+    # Heatmap cells carry the day's dwell time, so roll up once dwells are final.
+    location_heatmap.rollup_day(date)
+
+
+def rebuild_dwells(technician, from_time, to_time):
+    frappe.db.delete("Technician Dwell", {
+        "technician": technician,
+        "is_open": 0,
+        "start_time": ["between", [from_time, to_time]],
+    })
+
+    points = frappe.get_all(
+        "Technician Location Log",
+        filters={"technician": technician, "is_valid": 1, "captured_at": ["between", [from_time, to_time]]},
+        fields=["technician", "employee_checkin", "latitude", "longitude", "speed", "captured_at"],
+        order_by="captured_at asc",
+    )
+
+    state = None
+    for point in points:
+        state, closed = fold(state, point)
+        if closed:
+            _save_dwell(closed, is_open=False)
+    # An episode the live stream is still extending is left to it.
+    if state and state.duration >= MIN_DWELL_SECONDS and not _is_live(state):
+        _save_dwell(state, is_open=False)
+
+
+def match_complaint(technician, start_time, end_time):
+    """
+    The complaint assigned to `technician` that this stop most likely served:
+    one resolved during (or shortly after) the stop, else the only one open
+    throughout it.
+    """
+    start_time, end_time = get_datetime(start_time), get_datetime(end_time)
+    complaints = frappe.get_all(
+        "Complain",
+        filters={
+            "assigned_to_technician": technician,
+            "docstatus": ["<", 2],
+            "date": ["<=", getdate(end_time)],
+        },
+        or_filters=[
+            ["resolution_date", "is", "not set"],
+            ["resolution_date", ">=", getdate(start_time)],
+        ],
+        fields=["name", "date", "posting_time", "creation", "workflow_state", "time_to_resolution"],
+        order_by="date desc",
+        limit=20,
+    )
+
+    resolved, open_ = [], []
+    for complaint in complaints:
+        opened_at = get_datetime(f"{complaint.date} {complaint.posting_time}") if complaint.posting_time else complaint.creation
+        if opened_at > end_time:
+            continue
+        if complaint.workflow_state in RESOLVED_STATES and complaint.time_to_resolution:
+            resolved_at = add_to_date(opened_at, hours=flt(complaint.time_to_resolution))
+            if start_time <= resolved_at <= end_time + RESOLUTION_GRACE:
+                resolved.append((resolved_at, complaint.name))
+        elif complaint.workflow_state not in RESOLVED_STATES:
+            open_.append(complaint.name)
+
+    if resolved:
+        return min(resolved)[1]
+    if len(open_) == 1:
+        return open_[0]
+    return None
+
+
+def _save_dwell(state, is_open):
+    doc = frappe.get_doc("Technician Dwell", state.dwell) if state.dwell else frappe.new_doc("Technician Dwell")
+    doc.update({
+        "technician": state.technician,
+        "employee_checkin": state.employee_checkin,
+        "date": getdate(state.start),
+        "start_time": state.start,
+        "end_time": state.end,
+        "duration_seconds": int(state.duration),
+        "point_count": state.point_count,
+        "latitude": state.latitude,
+        "longitude": state.longitude,
+        "is_open": 1 if is_open else 0,
+        "complain": None if is_open else match_complaint(state.technician, state.start, state.end),
+    })
+    doc.save(ignore_permissions=True)
+    return doc.name
+
+
+def _is_live(state):
+    cached = _load_state(frappe.cache().get_value(f"{CANDIDATE_KEY}:{state.technician}"))
+    return bool(cached and cached.start == state.start)
+
+
+def _new_state(point):
+    return frappe._dict({
+        "technician": point.technician,
+        "employee_checkin": point.employee_checkin,
+        "start": point.captured_at,
+        "end": point.captured_at,
+        "duration": 0,
+        "point_count": 1,
+        "latitude": flt(point.latitude),
+        "longitude": flt(point.longitude),
+        "dwell": None,
+    })
+
+
+def _dump_state(state):
+    return {**state, "start": str(state.start), "end": str(state.end)}
+
+
+def _load_state(value):
+    if not value:
+        return None
+    state = frappe._dict(value)
+    state.start, state.end = get_datetime(state.start), get_datetime(state.end)
+    return state
@@ -0,0 +1,109 @@
+"""Streaming route export (CSV, GeoJSON, GPX) for audits.
+
+Points are read one keyset page at a time and written straight to a
+spooled temporary file, which is then streamed back to the client, so
+memory use stays flat however long the date range is.
+"""
+
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime, time, timezone
+from xml.sax.saxutils import escape
+from zoneinfo import ZoneInfo
+
+import frappe
+from frappe.utils import get_system_timezone, getdate
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+from hanif_traders.api.location import iter_route_points
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "geojson": ("application/geo+json", "geojson"),
+    "gpx": ("application/gpx+xml", "gpx"),
+}
+# Spill to disk once the export grows past this size.
+SPOOL_SIZE = 1024 * 1024
+
+
+@frappe.whitelist()
+def export_route(technician, from_date, to_date, format="csv"):
+    """
+    Download a technician's full route for a date range.
+    """
+    frappe.has_permission("Technician Location Log", "export", throw=True)
+
+    if format not in EXPORT_FORMATS:
+        frappe.throw(f"Unsupported export format: {format}")
+
+    from_time = datetime.combine(getdate(from_date), time.min)
+    to_time = datetime.combine(getdate(to_date), time.max)
+    if from_time > to_time:
+        frappe.throw("From Date must be before To Date")
+
+    points = iter_route_points(technician, from_time, to_time)
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE, mode="w+b")
+    text = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+    WRITERS[format](text, technician, points)
+    text.flush()
+    text.detach()
+    buffer.seek(0)
+
+    mimetype, extension = EXPORT_FORMATS[format]
+    filename = f"{technician}_{getdate(from_date)}_{getdate(to_date)}.{extension}"
+    return Response(
+        wrap_file(frappe.local.request.environ, buffer),
+        mimetype=mimetype,
+        direct_passthrough=True,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def write_csv(out, technician, points):
+    writer = csv.writer(out)
+    writer.writerow(["technician", "captured_at", "latitude", "longitude", "speed", "heading"])
+    for p in points:
+        writer.writerow([technician, p.captured_at, p.latitude, p.longitude, _blank(p.speed), _blank(p.heading)])
+
+
+def write_geojson(out, technician, points):
+    out.write('{"type":"FeatureCollection","features":[')
+    for i, p in enumerate(points):
+        feature = {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [p.longitude, p.latitude]},
+            "properties": {
+                "technician": technician,
+                "captured_at": str(p.captured_at),
+                "speed": p.speed,
+                "heading": p.heading,
+            },
+        }
+        out.write(("," if i else "") + json.dumps(feature, separators=(",", ":")))
+    out.write("]}")
+
+
+def write_gpx(out, technician, points):
+    tz = ZoneInfo(get_system_timezone())
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    out.write('<gpx version="1.1" creator="Hanif Traders" xmlns="http://www.topografix.com/GPX/1/1">\n')
+    out.write(f"<trk><name>{escape(technician)}</name><trkseg>\n")
+    for p in points:
+        # GPX times are UTC; stored times are in the system timezone.
+        utc = p.captured_at.replace(tzinfo=tz).astimezone(timezone.utc)
+        out.write(f'<trkpt lat="{p.latitude}" lon="{p.longitude}"><time>{utc:%Y-%m-%dT%H:%M:%SZ}</time></trkpt>\n')
+    out.write("</trkseg></trk>\n</gpx>\n")
+
+
+WRITERS = {
+    "csv": write_csv,
+    "geojson": write_geojson,
+    "gpx": write_gpx,
+}
+
+
+def _blank(value):
+    return "" if value is None else value
@@ -0,0 +1,152 @@
+"""Ingest-time filters for `Technician Location Log` rows.
+
+`coalesce_points` drops near-duplicate fixes from the same device before
+anything is stored, using a short-TTL cache of the last stored point
+(written by `remember_kept` after the store succeeds).
+
+For the outlier filter, each row is compared with the technician's previous accepted point (the
+`Technician Latest Location` row, then earlier rows of the same batch).
+Rejected rows are still stored, with `is_valid = 0` and a `reject_reason`,
+so downstream readers can skip them through an index.
+"""
+
+import frappe
+from frappe.utils import cint, flt, get_datetime
+
+from hanif_traders.api.geo import haversine
+
+ZERO_ACCURACY = "zero_accuracy"
+LOW_ACCURACY = "low_accuracy"
+DUPLICATE_TIMESTAMP = "duplicate_timestamp"
+IMPLIED_SPEED = "implied_speed"
+COALESCE_KEY = "technician_location_last_kept"
+
+
+def get_filter_settings():
+    settings = frappe.get_cached_doc("Complain Settings")
+    return frappe._dict({
+        "max_accuracy": flt(settings.location_max_accuracy) or 100,
+        "max_speed": flt(settings.location_max_speed) or 45,
+        # cint falls back only for unset values; a saved 0 still disables coalescing.
+        "coalesce_window": cint(settings.location_coalesce_window, 2),
+        "coalesce_distance": flt(settings.location_coalesce_distance) or 5,
+    })
+
+
+def coalesce_points(technician, points):
+    """
+    Split parsed points into (kept, dropped) for one technician. A point is
+    dropped when it is within the coalescing window and distance of the
+    last kept point from the same device, whether that point came earlier
+    in this request or from a recent one.
+
+    Nothing is cached here: call `remember_kept` once the kept points are
+    stored, so a retried fix is not mistaken for one already stored.
+    """
+    settings = get_filter_settings()
+    if settings.coalesce_window <= 0 or not points:
+        return list(points), []
+
+    cache = frappe.cache()
+    last_kept = {}
+    kept, dropped = [], []
+    for point in sorted(points, key=lambda p: p.captured_at):
+        key = _coalesce_key(technician, point)
+        if key not in last_kept:
+            last_kept[key] = cache.get_value(key)
+
+        last = last_kept[key]
+        if last and _is_near_duplicate(point, last, settings):
+            dropped.append(point)
+            continue
+
+        kept.append(point)
+        last_kept[key] = _as_last_kept(point)
+
+    return kept, dropped
+
+
+def remember_kept(technician, points):
+    """
+    Cache the newest stored point per device as the coalescing reference.
+    """
+    settings = get_filter_settings()
+    if settings.coalesce_window <= 0 or not points:
+        return
+
+    newest = {}
+    for point in sorted(points, key=lambda p: p.captured_at):
+        newest[_coalesce_key(technician, point)] = point
+
+    cache = frappe.cache()
+    for key, point in newest.items():
+        cache.set_value(key, _as_last_kept(point), expires_in_sec=settings.coalesce_window * 10)
+
+
+def _coalesce_key(technician, point):
+    return f"{COALESCE_KEY}:{technician}:{point.device_id or ''}"
+
+
+def _as_last_kept(point):
+    return {"latitude": point.latitude, "longitude": point.longitude, "captured_at": str(point.captured_at)}
+
+
+def _is_near_duplicate(point, last, settings):
+    seconds = abs((point.captured_at - get_datetime(last["captured_at"])).total_seconds())
+    if seconds >= settings.coalesce_window:
+        return False
+    return haversine(last["latitude"], last["longitude"], point.latitude, point.longitude) <= settings.coalesce_distance
+
+
+def apply_outlier_filter(rows):
+    """
+    Set `is_valid` / `reject_reason` on rows in place.
+    """
+    if not rows:
+        return
+
+    settings = get_filter_settings()
+    previous = {
+        d.technician: d
+        for d in frappe.get_all(
+            "Technician Latest Location",
+            filters={"technician": ["in", list({row.technician for row in rows})]},
+            fields=["technician", "latitude", "longitude", "captured_at"],
+        )
+    }
+
+    for row in sorted(rows, key=lambda r: r.captured_at):
+        last = previous.get(row.technician)
+        # Backlog points older than the latest position restart the chain.
+        if last and row.captured_at < last.captured_at:
+            last = None
+
+        row.reject_reason = check_point(row, last, settings)
+        row.is_valid = 0 if row.reject_reason else 1
+        if row.is_valid:
+            previous[row.technician] = row
+
+
+def check_point(point, last, settings):
+    """
+    Return a reject reason for `point`, or None when it should be kept.
+    """
+    if point.accuracy is not None:
+        if point.accuracy <= 0:
+            return ZERO_ACCURACY
+        if point.accuracy > settings.max_accuracy:
+            return LOW_ACCURACY
+
+    if not last:
+        return None
+
+    seconds = (point.captured_at - last.captured_at).total_seconds()
+    if seconds == 0:
+        return DUPLICATE_TIMESTAMP
+
+    if seconds > 0:
+        meters = haversine(last.latitude, last.longitude, point.latitude, point.longitude)
+        if meters / seconds > settings.max_speed:
+            return IMPLIED_SPEED
+
+    return None
@@ -0,0 +1,71 @@
+"""Daily heatmap rollup of location points into geohash cells.
+
+`rollup_day` runs nightly after the dwell rebuild. It groups a day's valid
+`Technician Location Log` rows by their geohash prefix (`CELL_PRECISION`,
+cells of roughly 150 m) and adds the day's `Technician Dwell` time at each
+cell, one `Location Heatmap Cell` row per cell. `get_heatmap` in
+api/location.py serves these rows for a bounding box and date range,
+merging them to coarser cells at low zoom.
+"""
+
+from datetime import datetime, time
+
+import frappe
+from frappe.utils import getdate, now_datetime
+
+from hanif_traders.api.geo import geohash_bbox, geohash_encode
+
+CELL_PRECISION = 7
+CELL_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "date", "geohash", "latitude", "longitude", "point_count", "technician_count", "dwell_seconds",
+)
+
+
+def rollup_day(date):
+    """
+    Rebuild every heatmap cell of `date`.
+    """
+    date = getdate(date)
+    cells = {}
+    for row in frappe.db.sql("""
+        SELECT LEFT(geohash, %(precision)s) AS cell, COUNT(*) AS point_count,
+            COUNT(DISTINCT technician) AS technician_count
+        FROM `tabTechnician Location Log`
+        WHERE captured_at BETWEEN %(from_time)s AND %(to_time)s
+        AND is_valid = 1 AND geohash IS NOT NULL
+        GROUP BY cell
+    """, {
+        "precision": CELL_PRECISION,
+        "from_time": datetime.combine(date, time.min),
+        "to_time": datetime.combine(date, time.max),
+    }, as_dict=True):
+        cells[row.cell] = [row.point_count, row.technician_count, 0]
+
+    for dwell in frappe.get_all(
+        "Technician Dwell",
+        filters={"date": date, "is_open": 0},
+        fields=["latitude", "longitude", "duration_seconds"],
+    ):
+        cell = geohash_encode(dwell.latitude, dwell.longitude, CELL_PRECISION)
+        cells.setdefault(cell, [0, 0, 0])[2] += dwell.duration_seconds or 0
+
+    frappe.db.delete("Location Heatmap Cell", {"date": date})
+    if cells:
+        now = now_datetime()
+        user = frappe.session.user
+        values = []
+        for cell, (point_count, technician_count, dwell_seconds) in cells.items():
+            latitude, longitude = cell_centre(cell)
+            values.append((
+                f"{date}-{cell}", now, now, user, user, 0,
+                date, cell, latitude, longitude, point_count, technician_count, dwell_seconds,
+            ))
+        frappe.db.bulk_insert("Location Heatmap Cell", CELL_FIELDS, values)
+    frappe.db.commit()
+    return len(cells)
+
+
+def cell_centre(geohash):
+    min_lat, min_lon, max_lat, max_lon = geohash_bbox(geohash)
+    return round((min_lat + max_lat) / 2, 6), round((min_lon + max_lon) / 2, 6)
@@ -0,0 +1,231 @@
+"""Columnar per-month archive of location history.
+
+Each closed month is written under `private/location_history/YYYY-MM/` as
+one fixed-width binary file per column plus a `manifest.json`. Rows are
+sorted by technician, then captured_at, and the manifest records each
+technician's row range. Readers memory-map only the columns they ask for,
+so replaying one route or computing fleet statistics never touches
+MariaDB and never loads unused columns.
+
+Columns (native byte order, recorded in the manifest):
+    captured_at   q  milliseconds since 1970-01-01 in system-timezone wall time
+    latitude      d
+    longitude     d
+    speed         f  NaN when not reported
+    heading       f  NaN when not reported
+"""
+
+import json
+import math
+import mmap
+import os
+import re
+import shutil
+import sys
+from array import array
+from datetime import datetime, time, timedelta
+
+import frappe
+from frappe.utils import add_months, get_last_day, getdate, today
+
+from hanif_traders.api.geo import segment_distances
+
+COLUMNS = {
+    "captured_at": "q",
+    "latitude": "d",
+    "longitude": "d",
+    "speed": "f",
+    "heading": "f",
+}
+EPOCH = datetime(1970, 1, 1)
+FORMAT_VERSION = 1
+MONTH_PATTERN = re.compile(r"\d{4}-\d{2}")
+
+
+def get_history_path(month=None):
+    if month and not MONTH_PATTERN.fullmatch(month):
+        frappe.throw(f"Invalid month: {month}. Use YYYY-MM")
+    path = frappe.get_site_path("private", "location_history")
+    return os.path.join(path, month) if month else path
+
+
+def export_closed_month(month=None):
+    """
+    Scheduler hook: write last month (or `month`, "YYYY-MM") if it is not archived yet.
+    """
+    month = month or getdate(add_months(today(), -1)).strftime("%Y-%m")
+    if os.path.exists(os.path.join(get_history_path(month), "manifest.json")):
+        return
+    export_month(month)
+
+
+def export_month(month):
+    """
+    Write the columnar files for `month`, streaming one technician at a time.
+    """
+    from hanif_traders.api.location import iter_route_points
+
+    first_day = getdate(f"{month}-01")
+    from_time = datetime.combine(first_day, time.min)
+    to_time = datetime.combine(get_last_day(first_day), time.max)
+
+    technicians = sorted(set(
+        frappe.get_all(
+            "Technician Route Archive",
+            filters={"date": ["between", [first_day, get_last_day(first_day)]]},
+            pluck="technician",
+            distinct=True,
+        )
+        + [row[0] for row in frappe.db.sql("""
+            SELECT DISTINCT technician FROM `tabTechnician Location Log`
+            WHERE captured_at BETWEEN %s AND %s AND is_valid = 1
+        """, (from_time, to_time))]
+    ))
+
+    target = get_history_path(month)
+    staging = f"{target}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    files = {name: open(os.path.join(staging, f"{name}.bin"), "wb") for name in COLUMNS}
+    ranges = {}
+    row_count = 0
+    try:
+        for technician in technicians:
+            columns = {name: array(code) for name, code in COLUMNS.items()}
+            for point in iter_route_points(technician, from_time, to_time):
+                columns["captured_at"].append(_to_millis(point.captured_at))
+                columns["latitude"].append(point.latitude)
+                columns["longitude"].append(point.longitude)
+                columns["speed"].append(_or_nan(point.speed))
+                columns["heading"].append(_or_nan(point.heading))
+
+            count = len(columns["captured_at"])
+            if not count:
+                continue
+            for name, values in columns.items():
+                values.tofile(files[name])
+            ranges[technician] = [row_count, row_count + count]
+            row_count += count
+    finally:
+        for f in files.values():
+            f.close()
+
+    with open(os.path.join(staging, "manifest.json"), "w") as f:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "month": month,
+            "byteorder": sys.byteorder,
+            "row_count": row_count,
+            "columns": COLUMNS,
+            "technicians": ranges,
+        }, f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    return target
+
+
+class MonthHistory:
+    """
+    Read-only, memory-mapped view of one archived month.
+    """
+
+    def __init__(self, month):
+        self.path = get_history_path(month)
+        manifest_path = os.path.join(self.path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No location history archive for {month}")
+
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        if self.manifest["byteorder"] != sys.byteorder:
+            raise ValueError("Location history archive was written with a different byte order")
+        self._maps = {}
+
+    @property
+    def technicians(self):
+        return list(self.manifest["technicians"])
+
+    def column(self, name):
+        """
+        Memory-mapped column as a typed memoryview; only this file is opened.
+        """
+        if name not in self._maps:
+            code = self.manifest["columns"][name]
+            with open(os.path.join(self.path, f"{name}.bin"), "rb") as f:
+                if not os.fstat(f.fileno()).st_size:
+                    self._maps[name] = memoryview(array(code))
+                else:
+                    self._maps[name] = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast(code)
+        return self._maps[name]
+
+    def replay(self, technician, columns=("captured_at", "latitude", "longitude"), from_time=None, to_time=None):
+        """
+        A technician's points as dicts holding only `columns`, in time order.
+        """
+        start, end = self.manifest["technicians"].get(technician, (0, 0))
+        if start == end:
+            return []
+
+        times = self.column("captured_at")[start:end]
+        lo, hi = 0, end - start
+        if from_time:
+            lo = _bisect(times, _to_millis(from_time))
+        if to_time:
+            hi = _bisect(times, _to_millis(to_time) + 1)
+
+        selected = {name: self.column(name)[start + lo:start + hi] for name in columns}
+        points = []
+        for i in range(hi - lo):
+            point = frappe._dict()
+            for name, values in selected.items():
+                point[name] = _from_column(name, values[i])
+            points.append(point)
+        return points
+
+    def fleet_stats(self):
+        """
+        Point count and distance per technician, reading only the coordinate columns.
+        """
+        lats, lons = self.column("latitude"), self.column("longitude")
+        stats = []
+        for technician, (start, end) in self.manifest["technicians"].items():
+            meters = sum(segment_distances(lats[start:end], lons[start:end]))
+            stats.append({"technician": technician, "point_count": end - start, "distance_km": round(meters / 1000, 3)})
+        return sorted(stats, key=lambda row: row["distance_km"], reverse=True)
+
+    def close(self):
+        for view in self._maps.values():
+            obj = view.obj
+            view.release()
+            if isinstance(obj, mmap.mmap):
+                obj.close()
+        self._maps = {}
+
+
+def _to_millis(value):
+    return round((value - EPOCH).total_seconds() * 1000)
+
+
+def _from_column(name, value):
+    if name == "captured_at":
+        return EPOCH + timedelta(milliseconds=value)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def _or_nan(value):
+    return math.nan if value is None else value
+
+
+def _bisect(values, target):
+    lo, hi = 0, len(values)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[mid] < target:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
@@ -0,0 +1,212 @@
+"""Redis counters and rolling histograms for location telemetry.
+
+Lifetime counters live under one key each. Every minute also gets one
+hash holding that minute's counters, a capture-to-receive lag histogram
+and a request latency histogram; it expires after `RETENTION_MINUTES`.
+`get_ingest_stats` sums the last few minute hashes into rates and
+percentiles.
+
+Within an ingest request (`track_request`) updates are collected in memory
+and written with a single pipeline when the request ends. Nothing here
+touches the database, and missing Redis only loses the numbers, never the
+request.
+"""
+
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint, flt
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from hanif_traders.api.response import create_response
+
+COUNTER_PREFIX = "technician_location_metrics"
+COUNTERS = ("received", "stored", "coalesced", "flagged")
+REJECT_PREFIX = "rejected:"
+# Points rejected before they are counted as received.
+INVALID_POINT = "invalid_point"
+RETENTION_MINUTES = 120
+DEFAULT_WINDOW_MINUTES = 15
+# Upper bucket edges; values above the last edge fall in an overflow bucket.
+LAG_BUCKETS = (1, 2, 5, 10, 30, 60, 120, 300, 900, 3600, 21600, 86400)  # seconds
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)  # milliseconds
+PERCENTILES = (50, 90, 99)
+
+
+def incr(name, amount=1):
+    if not amount:
+        return
+    collector = getattr(frappe.local, "location_metrics", None)
+    if collector is not None:
+        collector[name] += amount
+        return
+    _write(Counter({name: amount}))
+
+
+def reject(reason, amount=1):
+    incr(f"{REJECT_PREFIX}{reason}", amount)
+
+
+def observe_lag(seconds):
+    """
+    Record one point's capture-to-receive lag. A negative lag means the
+    device clock is ahead of the server.
+    """
+    if seconds < 0:
+        incr("clock_ahead")
+        incr("clock_ahead_seconds", round(-seconds))
+        seconds = 0
+    incr(f"lag:{_bucket(LAG_BUCKETS, seconds)}")
+
+
+@contextmanager
+def track_request():
+    """
+    Collect this request's metrics in memory and write them, with its
+    latency, in one pipeline on exit.
+    """
+    collector = frappe.local.location_metrics = Counter()
+    started = time.monotonic()
+    try:
+        yield collector
+    finally:
+        frappe.local.location_metrics = None
+        latency_ms = (time.monotonic() - started) * 1000
+        collector["requests"] += 1
+        collector["latency_ms"] += round(latency_ms)
+        collector[f"latency:{_bucket(LATENCY_BUCKETS, latency_ms)}"] += 1
+        _write(collector)
+
+
+def get_counters():
+    cache = frappe.cache()
+    try:
+        values = cache.mget([_key(name) for name in COUNTERS])
+    except RedisConnectionError:
+        return {}
+    return {name: cint(value) for name, value in zip(COUNTERS, values, strict=True)}
+
+
+def get_window(minutes=DEFAULT_WINDOW_MINUTES):
+    """
+    Sum of the per-minute hashes for the last `minutes` minutes (current one included).
+    """
+    current = _minute()
+    pipe = frappe.cache().pipeline()
+    for minute in range(current - minutes + 1, current + 1):
+        pipe.hgetall(_minute_key(minute))
+
+    totals = Counter()
+    for values in pipe.execute():
+        for field, value in values.items():
+            totals[frappe.safe_decode(field)] += cint(value)
+    return totals
+
+
+def summarize_window(totals, minutes):
+    """
+    Turn summed minute counters into rates and percentiles.
+    """
+    received = totals["received"]
+    # Every point that reached ingest, including the ones refused as invalid.
+    seen = received + totals[f"{REJECT_PREFIX}{INVALID_POINT}"]
+    requests = totals["requests"]
+    return {
+        "window_minutes": minutes,
+        "requests": requests,
+        "counters": {name: totals[name] for name in COUNTERS},
+        "points_per_second": flt(received / (minutes * 60), 3),
+        "reject_rate": {
+            name[len(REJECT_PREFIX):]: flt(count / (seen or 1), 4)
+            for name, count in totals.items()
+            if name.startswith(REJECT_PREFIX)
+        },
+        "lag_seconds": {
+            **_percentiles(LAG_BUCKETS, totals, "lag"),
+            "clock_ahead": totals["clock_ahead"],
+            "mean_clock_ahead": flt(totals["clock_ahead_seconds"] / (totals["clock_ahead"] or 1), 1),
+        },
+        "latency_ms": {
+            **_percentiles(LATENCY_BUCKETS, totals, "latency"),
+            "mean": flt(totals["latency_ms"] / (requests or 1), 1),
+        },
+    }
+
+
+def _percentiles(edges, totals, prefix):
+    counts = [totals[f"{prefix}:{i}"] for i in range(len(edges) + 1)]
+    total = sum(counts)
+    result = {}
+    for percentile in PERCENTILES:
+        rank = total * percentile / 100
+        running = 0
+        value = None
+        for i, count in enumerate(counts):
+            running += count
+            if total and running >= rank:
+                # Report the bucket's upper edge; the overflow bucket reports its lower edge.
+                value = edges[min(i, len(edges) - 1)]
+                break
+        result[f"p{percentile}"] = value
+    return result
+
+
+def _write(counters):
+    counters = {name: amount for name, amount in counters.items() if amount}
+    if not counters:
+        return
+
+    minute_key = _minute_key(_minute())
+    try:
+        pipe = frappe.cache().pipeline()
+        for name, amount in counters.items():
+            if name in COUNTERS:
+                pipe.incrby(_key(name), amount)
+            pipe.hincrby(minute_key, name, amount)
+        pipe.expire(minute_key, RETENTION_MINUTES * 60)
+        pipe.execute()
+    except RedisConnectionError:
+        pass
+
+
+def _bucket(edges, value):
+    for i, edge in enumerate(edges):
+        if value <= edge:
+            return i
+    return len(edges)
+
+
+def _minute():
+    return int(time.time() // 60)
+
+
+def _key(name):
+    return frappe.cache().make_key(f"{COUNTER_PREFIX}:{name}")
+
+
+def _minute_key(minute):
+    return _key(f"minute:{minute}")
+
+
+@frappe.whitelist()
+def get_ingest_counters():
+    frappe.only_for("System Manager")
+    return create_response(data=get_counters())
+
+
+@frappe.whitelist()
+def get_ingest_stats(window=DEFAULT_WINDOW_MINUTES):
+    """
+    Rolling ingest latency, lag percentiles, throughput and reject rates.
+    """
+    frappe.only_for("System Manager")
+
+    minutes = min(max(cint(window) or DEFAULT_WINDOW_MINUTES, 1), RETENTION_MINUTES)
+    try:
+        totals = get_window(minutes)
+    except RedisConnectionError:
+        return create_response(data={"redis_available": False})
+
+    return create_response(data={**summarize_window(totals, minutes), "lifetime": get_counters()})
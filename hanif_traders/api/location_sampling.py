@@ -0,0 +1,70 @@
+"""Server-recommended sampling interval for the mobile tracker.
+
+`ingest` and `ingest_batch` return `meta.next_interval` (seconds). Moving
+technicians are asked for roughly one fix per sampling distance; stationary
+ones (slow, or whose fix was coalesced as a near-duplicate) drop to the
+maximum interval. Poor accuracy asks for a sooner retry, while a low
+battery and a filling ingest buffer stretch the interval.
+"""
+
+import frappe
+from frappe.utils import cint, flt
+
+from hanif_traders.api import location_buffer
+from hanif_traders.api.location_filter import get_filter_settings
+
+# Below this speed (m/s) a technician counts as stationary.
+STATIONARY_SPEED = 0.5
+# Buffer load above which the interval starts to stretch, up to 3x when full.
+LOAD_THRESHOLD = 0.5
+
+
+def get_sampling_settings():
+    settings = frappe.get_cached_doc("Complain Settings")
+    min_interval = cint(settings.location_min_interval) or 10
+    return frappe._dict({
+        "min_interval": min_interval,
+        "max_interval": max(min_interval, cint(settings.location_max_interval) or 300),
+        "sampling_distance": flt(settings.location_sampling_distance) or 100,
+        "low_battery_level": cint(settings.location_low_battery_level) or 20,
+    })
+
+
+def recommend_interval(point=None, battery_level=None, stationary=False):
+    """
+    Seconds until the tracker should take its next fix, given the latest
+    point it sent (or None when nothing was accepted).
+    """
+    settings = get_sampling_settings()
+
+    speed = flt(point.speed) if point and point.speed is not None else None
+    if stationary or (speed is not None and speed < STATIONARY_SPEED):
+        interval = settings.max_interval
+    elif speed:
+        interval = settings.sampling_distance / speed
+    else:
+        # Speed not reported: keep a moderate cadence until we know more.
+        interval = settings.min_interval * 3
+
+    if point and point.accuracy and point.accuracy > get_filter_settings().max_accuracy:
+        interval = min(interval, settings.min_interval * 3)
+
+    if battery_level not in (None, ""):
+        battery_level = cint(battery_level)
+        if battery_level <= settings.low_battery_level / 2:
+            interval *= 4
+        elif battery_level <= settings.low_battery_level:
+            interval *= 2
+
+    load = location_buffer.get_load()
+    if load > LOAD_THRESHOLD:
+        interval *= 1 + (load - LOAD_THRESHOLD) * 4
+
+    return int(min(settings.max_interval, max(settings.min_interval, round(interval))))
+
+
+def backoff_interval():
+    """
+    Interval to return when the server is refusing points.
+    """
+    return get_sampling_settings().max_interval
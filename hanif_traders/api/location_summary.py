@@ -0,0 +1,181 @@
+"""Per-technician, per-checkin distance and moving-time summaries.
+
+`update_summaries` runs on every written batch and extends each summary
+from its stored last point, so reads never touch `Technician Location Log`.
+Points that arrive out of order (offline backlog) trigger a rebuild of that
+checkin's summary, and `rebuild_closed_day` recomputes yesterday nightly.
+"""
+
+from datetime import datetime, time, timedelta
+
+import frappe
+from frappe.utils import flt, getdate, now_datetime, today
+
+from hanif_traders.api.geo import segment_distances
+
+# Segments slower than this (m/s) count as stationary jitter, not movement.
+MOVING_SPEED = 0.5
+# Gaps longer than this (seconds) are not counted as moving time.
+MAX_SEGMENT_GAP = 300
+SUMMARY_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "technician", "technician_name", "employee", "employee_checkin", "date",
+    "distance_km", "moving_seconds", "point_count",
+    "first_captured_at", "last_captured_at", "last_latitude", "last_longitude",
+)
+
+
+def summary_name(technician, employee_checkin):
+    return f"{technician}-{employee_checkin}"
+
+
+def summarize(points, previous=None):
+    """
+    Distance (m) and moving time (s) over time-ordered points, optionally
+    continuing from a `previous` point with latitude/longitude/captured_at.
+    """
+    if previous:
+        points = [previous, *points]
+
+    lats = [flt(p.latitude) for p in points]
+    lons = [flt(p.longitude) for p in points]
+    times = [p.captured_at for p in points]
+
+    distance = 0.0
+    moving = 0.0
+    for meters, start, end in zip(segment_distances(lats, lons), times, times[1:], strict=False):
+        distance += meters
+        seconds = (end - start).total_seconds()
+        if 0 < seconds <= MAX_SEGMENT_GAP and meters / seconds >= MOVING_SPEED:
+            moving += seconds
+
+    return distance, moving
+
+
+def update_summaries(rows):
+    """
+    Fold freshly written log rows into their checkin summaries.
+    """
+    groups = {}
+    for row in rows:
+        if row.employee_checkin and row.get("is_valid", 1):
+            groups.setdefault(summary_name(row.technician, row.employee_checkin), []).append(row)
+
+    if not groups:
+        return
+
+    existing = {
+        d.name: d
+        for d in frappe.get_all(
+            "Technician Distance Summary",
+            filters={"name": ["in", list(groups)]},
+            fields=["name", "last_captured_at", "last_latitude", "last_longitude"],
+        )
+    }
+
+    summaries = []
+    for name, points in groups.items():
+        points.sort(key=lambda p: p.captured_at)
+        previous = existing.get(name)
+        if previous and points[0].captured_at < previous.last_captured_at:
+            # A backlog point landed inside the covered range; recount from raw rows.
+            frappe.enqueue(
+                "hanif_traders.api.location_summary.rebuild_summary",
+                queue="short",
+                job_id=f"distance_summary_rebuild::{name}",
+                deduplicate=True,
+                enqueue_after_commit=True,
+                technician=points[0].technician,
+                employee_checkin=points[0].employee_checkin,
+            )
+            continue
+
+        if previous:
+            previous = frappe._dict(
+                latitude=previous.last_latitude,
+                longitude=previous.last_longitude,
+                captured_at=previous.last_captured_at,
+            )
+        distance, moving = summarize(points, previous)
+        summaries.append(_summary_row(name, points, distance, moving))
+
+    _write_summaries(summaries, incremental=True)
+
+
+def rebuild_summary(technician, employee_checkin):
+    """
+    Recompute one checkin summary from its raw valid points.
+    """
+    points = frappe.get_all(
+        "Technician Location Log",
+        filters={"technician": technician, "employee_checkin": employee_checkin, "is_valid": 1},
+        fields=["technician", "technician_name", "employee", "employee_checkin", "latitude", "longitude", "captured_at"],
+        order_by="captured_at asc",
+    )
+    if not points:
+        return
+
+    distance, moving = summarize(points)
+    _write_summaries([_summary_row(summary_name(technician, employee_checkin), points, distance, moving)])
+
+
+def rebuild_closed_day(date=None):
+    """
+    Scheduler hook: recompute every summary for a closed day (default yesterday).
+    """
+    date = getdate(date) if date else getdate(today()) - timedelta(days=1)
+    checkins = frappe.db.sql("""
+        SELECT DISTINCT technician, employee_checkin
+        FROM `tabTechnician Location Log`
+        WHERE captured_at BETWEEN %s AND %s
+        AND employee_checkin IS NOT NULL
+    """, (datetime.combine(date, time.min), datetime.combine(date, time.max)), as_dict=True)
+
+    for checkin in checkins:
+        rebuild_summary(checkin.technician, checkin.employee_checkin)
+        frappe.db.commit()
+
+
+def _summary_row(name, points, distance, moving):
+    first, last = points[0], points[-1]
+    now = now_datetime()
+    user = frappe.session.user
+    return (
+        name, now, now, user, user, 0,
+        first.technician, first.technician_name, first.employee, first.employee_checkin, getdate(first.captured_at),
+        round(distance / 1000, 3), int(moving), len(points),
+        first.captured_at, last.captured_at, last.latitude, last.longitude,
+    )
+
+
+def _write_summaries(summaries, incremental=False):
+    if not summaries:
+        return
+
+    if incremental:
+        # Totals are added to the stored ones; first point and date stay as first written.
+        updates = """
+            distance_km = distance_km + VALUES(distance_km),
+            moving_seconds = moving_seconds + VALUES(moving_seconds),
+            point_count = point_count + VALUES(point_count),
+        """
+    else:
+        updates = """
+            distance_km = VALUES(distance_km),
+            moving_seconds = VALUES(moving_seconds),
+            point_count = VALUES(point_count),
+            first_captured_at = VALUES(first_captured_at),
+            date = VALUES(date),
+        """
+
+    placeholders = f"({', '.join(['%s'] * len(SUMMARY_FIELDS))})"
+    frappe.db.sql(f"""
+        INSERT INTO `tabTechnician Distance Summary` ({", ".join(f"`{f}`" for f in SUMMARY_FIELDS)})
+        VALUES {", ".join([placeholders] * len(summaries))}
+        ON DUPLICATE KEY UPDATE
+            {updates}
+            last_captured_at = VALUES(last_captured_at),
+            last_latitude = VALUES(last_latitude),
+            last_longitude = VALUES(last_longitude),
+            modified = VALUES(modified)
+    """, [value for row in summaries for value in row])
@@ -0,0 +1,148 @@
+"""Background SMS worker for `SMS Queue`.
+
+`hanif_traders.api.utils.send_sms` only inserts queue rows and enqueues
+`flush_sms_queue`; nothing talks to the gateway inside a save. The worker
+claims up to a batch of due rows, sends each one in its own gateway call
+and marks it Sent. On failure a row is retried with exponential backoff until `sms_max_retries`, then
+marked Failed. The scheduler polls every few minutes for retries.
+"""
+
+import frappe
+from frappe.utils import add_to_date, cint, now_datetime
+
+FLUSH_JOB_ID = "sms_queue_flush"
+BACKOFF_BASE_SECONDS = 60
+MAX_BACKOFF_SECONDS = 3600
+# Rows stuck in Sending this long (a worker died mid-batch) are picked up again.
+STALE_SENDING_MINUTES = 15
+
+
+def get_sms_settings():
+    settings = frappe.get_cached_doc("Complain Settings")
+    return frappe._dict({
+        "gateway": settings.sms_gateway or "Frappe SMS Settings",
+        "batch_size": cint(settings.sms_batch_size) or 100,
+        "max_retries": cint(settings.sms_max_retries) or 5,
+    })
+
+
+def queue_messages(messages, reference_doctype=None, reference_name=None):
+    """
+    Persist (receiver, message) pairs and schedule a flush after commit.
+    An item may also be (receiver, message, reference_doctype, reference_name)
+    to override the shared reference.
+    """
+    if not messages:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "SMS Queue",
+        [
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "receiver", "message", "status", "retry_count", "next_attempt_at",
+            "reference_doctype", "reference_name",
+        ],
+        [
+            (frappe.generate_hash(length=10), now, now, user, user, 0,
+             receiver, message, "Queued", 0, now, *(reference or (reference_doctype, reference_name)))
+            for receiver, message, *reference in messages
+        ],
+    )
+    frappe.enqueue(
+        "hanif_traders.api.sms_queue.flush_sms_queue",
+        queue="short",
+        job_id=FLUSH_JOB_ID,
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
+
+
+def flush_sms_queue():
+    """
+    Send due messages until none are left (scheduler hook and enqueued job).
+    """
+    settings = get_sms_settings()
+    while _flush_batch(settings) == settings.batch_size:
+        pass
+
+
+def _flush_batch(settings):
+    now = now_datetime()
+    rows = frappe.db.sql("""
+        SELECT name, receiver, message, retry_count
+        FROM `tabSMS Queue`
+        WHERE (status = 'Queued' AND next_attempt_at <= %(now)s)
+            OR (status = 'Sending' AND modified < %(stale)s)
+        ORDER BY next_attempt_at
+        LIMIT %(limit)s
+        FOR UPDATE SKIP LOCKED
+    """, {
+        "now": now,
+        "stale": add_to_date(now, minutes=-STALE_SENDING_MINUTES),
+        "limit": settings.batch_size,
+    }, as_dict=True)
+    if not rows:
+        return 0
+
+    _set_status([r.name for r in rows], "Sending", modified=now)
+    frappe.db.commit()
+
+    # One gateway call per row: a bad number must not fail (and resend) anyone else's message.
+    for row in rows:
+        try:
+            GATEWAYS[settings.gateway]([row.receiver], row.message)
+        except Exception as e:
+            frappe.db.rollback()
+            _schedule_retry([row], str(e), settings)
+        else:
+            _set_status([row.name], "Sent", sent_at=now_datetime())
+        frappe.db.commit()
+
+    return len(rows)
+
+
+def _schedule_retry(rows, error, settings):
+    now = now_datetime()
+    for row in rows:
+        retry_count = cint(row.retry_count) + 1
+        if retry_count > settings.max_retries:
+            _set_status([row.name], "Failed", retry_count=retry_count, last_error=error)
+            continue
+        delay = min(BACKOFF_BASE_SECONDS * 2 ** (retry_count - 1), MAX_BACKOFF_SECONDS)
+        _set_status(
+            [row.name],
+            "Queued",
+            retry_count=retry_count,
+            last_error=error,
+            next_attempt_at=add_to_date(now, seconds=delay),
+        )
+
+
+def _set_status(names, status, modified=None, **values):
+    values = {"status": status, "modified": modified or now_datetime(), **values}
+    assignments = ", ".join(f"`{field}` = %({field})s" for field in values)
+    frappe.db.sql(
+        f"UPDATE `tabSMS Queue` SET {assignments} WHERE name IN %(names)s",
+        {**values, "names": tuple(names)},
+    )
+
+
+def send_via_sms_settings(receivers, message):
+    from frappe.core.doctype.sms_settings.sms_settings import send_sms
+
+    send_sms(receiver_list=receivers, msg=message, success_msg=False)
+
+
+def send_via_local_stub(receivers, message):
+    """
+    Offline gateway: log the message instead of sending it.
+    """
+    frappe.logger("sms_stub").info({"receivers": receivers, "message": message})
+
+
+GATEWAYS = {
+    "Frappe SMS Settings": send_via_sms_settings,
+    "Local Stub": send_via_local_stub,
+}
@@ -2,8 +2,13 @@ import frappe
 from frappe.utils import today, flt
 from hanif_traders.api.response import create_response, SUCCESS, UNAUTHORIZED, NOT_FOUND, OFF_DUTY
 
-def process_incentive(complain_name, reason):
-    complaint = frappe.get_doc("Complain", complain_name)
+def process_incentive(complain_name, reason, complaint=None):
+    """
+    Post the currency and point incentives for a resolved complaint.
+    `complaint` (name, assigned_to_technician, resolution_date) skips
+    re-reading it when the caller already has it.
+    """
+    complaint = complaint or frappe.get_doc("Complain", complain_name)
     tech_name = complaint.assigned_to_technician
     if not tech_name:
         return
@@ -170,6 +175,36 @@ def _update_technician_points(tech_name, points):
         WHERE name = %s
     """, (points, tech_name))
 
+def queue_avg_resolution_time(tech_name):
+    """
+    Recompute the technician's average after commit; resolutions in quick
+    succession share one pending job per technician. The dirty flag makes a
+    job that is already running go round once more, since deduplication
+    also skips the enqueue while it runs.
+    """
+    cache = frappe.cache()
+    frappe.db.after_commit.add(lambda: cache.set(_avg_resolution_dirty_key(tech_name), 1))
+    frappe.enqueue(
+        "hanif_traders.api.technician.refresh_avg_resolution_time",
+        job_id=f"update_avg_resolution_time::{tech_name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        tech_name=tech_name,
+    )
+
+def refresh_avg_resolution_time(tech_name):
+    """
+    Background job: recompute until no resolution has flagged the technician since the last pass.
+    """
+    cache = frappe.cache()
+    while cache.delete(_avg_resolution_dirty_key(tech_name)):
+        update_avg_resolution_time(tech_name)
+        # End the transaction so the next pass reads newly committed resolutions.
+        frappe.db.commit()
+
+def _avg_resolution_dirty_key(tech_name):
+    return frappe.cache().make_key(f"avg_resolution_time_dirty:{tech_name}")
+
 def update_avg_resolution_time(tech_name):
     # Calculate average time_to_resolution for this technician
     data = frappe.db.sql("""
@@ -1,7 +1,11 @@
+import re
+
 import frappe
 
 from hanif_traders.api.response import create_response, SUCCESS, SERVER_ERROR
 
+MIN_PHONE_DIGITS = 7
+
 @frappe.whitelist()
 def log_error(title, message):
     try:
@@ -23,6 +27,41 @@ def create_journal_entry():
     # TODO : Create General Purpose Journal Entry for use by App Doctypes
     pass
 
-def send_sms():
-    # TODO : App Wrapper for frappe.core.doctype.sms_settings.sms_settings import send_sms
-    pass
\ No newline at end of file
+def normalize_phone(phone):
+    """
+    Reduce a Pakistani phone number to local digits: "+92-300-1234567",
+    "923001234567" and "03001234567" all become "03001234567". Returns None
+    when too few digits are left to be a number (e.g. the bare "+92-" default).
+    """
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("0092"):
+        digits = "0" + digits[4:]
+    elif digits.startswith("92") and len(digits) == 12:
+        digits = "0" + digits[2:]
+    elif digits.startswith("3") and len(digits) == 10:
+        digits = "0" + digits
+    return digits if len(digits) >= MIN_PHONE_DIGITS else None
+
+def phone_search_prefix(fragment):
+    """
+    Leading digits of a typed phone fragment in normalized form, for
+    prefix matching: "+92 300 12" and "030012" both give "030012".
+    """
+    digits = re.sub(r"\D", "", fragment or "")
+    if digits.startswith("0092"):
+        digits = "0" + digits[4:]
+    elif digits.startswith("92"):
+        digits = "0" + digits[2:]
+    elif digits.startswith("3"):
+        digits = "0" + digits
+    return digits
+
+def send_sms(receiver_list, msg, reference_doctype=None, reference_name=None):
+    """
+    Queue `msg` for each receiver; hanif_traders.api.sms_queue sends it in the background.
+    """
+    from hanif_traders.api.sms_queue import queue_messages
+
+    if isinstance(receiver_list, str):
+        receiver_list = [receiver_list]
+    queue_messages([(receiver, msg) for receiver in receiver_list if receiver], reference_doctype, reference_name)
\ No newline at end of file
@@ -5,25 +5,44 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import today
 
+from hanif_traders.api import complain_sync
+from hanif_traders.api.utils import normalize_phone
+
+# Most recent duplicates listed in the warning; the rest are only counted.
+DUPLICATE_PHONE_PREVIEW = 5
+COMPLAINER_FULLTEXT_INDEX = "complainer_fulltext"
+
 
 class Complain(Document):
 	def validate(self):
 		if self.workflow_state == "Assigned" and not self.assigned_to_technician:
 			frappe.throw("Validate : Please assign a technician before setting status to Assigned.")
 
-		if self.complainer_phone:
-			duplicates = frappe.db.get_all(
-				"Complain",
-				filters={"complainer_phone": self.complainer_phone, "name": ["!=", self.name]},
-				fields=["name", "date", "workflow_state"]
-			)
-			if duplicates:
-				msg = "<b>Warning: Duplicate Phone Number</b><br>"
-				msg += f"The phone number {self.complainer_phone} has been used in the following complaints:<br><ul>"
-				for d in duplicates:
-					msg += f"<li><a href='/app/complain/{d.name}'>{d.name}</a> ({d.date}) - {d.workflow_state}</li>"
-				msg += "</ul>"
-				frappe.msgprint(msg, title="Duplicate Complaint Warning", indicator="orange")
+		self.complainer_phone_normalized = normalize_phone(self.complainer_phone)
+		if self.complainer_phone_normalized and (self.is_new() or self.has_value_changed("complainer_phone_normalized")):
+			self.warn_duplicate_phone()
+
+	def warn_duplicate_phone(self):
+		filters = {"complainer_phone_normalized": self.complainer_phone_normalized, "name": ["!=", self.name]}
+		count = frappe.db.count("Complain", filters)
+		if not count:
+			return
+
+		recent = frappe.db.get_all(
+			"Complain",
+			filters=filters,
+			fields=["name", "date", "workflow_state"],
+			order_by="creation desc",
+			limit=DUPLICATE_PHONE_PREVIEW,
+		)
+		msg = "<b>Warning: Duplicate Phone Number</b><br>"
+		msg += f"The phone number {self.complainer_phone} has been used in {count} other complaint(s):<br><ul>"
+		for d in recent:
+			msg += f"<li><a href='/app/complain/{d.name}'>{d.name}</a> ({d.date}) - {d.workflow_state}</li>"
+		if count > len(recent):
+			msg += f"<li>and {count - len(recent)} more</li>"
+		msg += "</ul>"
+		frappe.msgprint(msg, title="Duplicate Complaint Warning", indicator="orange")
 
 	def before_save(self):
 		if self.workflow_state in ["Resolved", "CSC Verified"]:
@@ -38,6 +57,8 @@ class Complain(Document):
 
 	def on_update(self):
 		old = self.get_doc_before_save()
+		complain_sync.record_doc_change(self, old)
+
 		if not self.complainer_phone:
 			return
 
@@ -61,8 +82,8 @@ class Complain(Document):
 				msg = frappe.render_template(settings.open_sms_template, {"doc": self})
 
 		elif new_state == "Assigned" and old_state != "Assigned":
-			code_int = abs(hash(self.name + str(self.modified))) % 9000 + 1000
-			csc = str(code_int)
+			from hanif_traders.api.complain import generate_csc
+			csc = generate_csc(self.name, self.modified)
 			frappe.db.set_value("Complain", self.name, "complain_csc", csc)
 
 			if settings.assigned_sms_template:
@@ -80,15 +101,29 @@ class Complain(Document):
 		)
 
 		if msg and not is_test_tech:
-			try:
-				from frappe.core.doctype.sms_settings.sms_settings import send_sms
-				send_sms(receiver_list=[to_number], msg=msg)
-				frappe.msgprint(f"✅ SMS Sent")
-			except Exception as e:
-				frappe.msgprint(f"❌ SMS Error: {e}")
+			from hanif_traders.api.utils import send_sms
+			send_sms([to_number], msg, reference_doctype="Complain", reference_name=self.name)
+			frappe.msgprint("✅ SMS Queued")
 		
 		if old and old.assigned_to_technician != self.assigned_to_technician and old.assigned_to_technician and self.assigned_to_technician:
 			self.add_comment("Comment", f"Technician changed from <b>{old_name}</b> to <b>{new_name}</b>")
 
+	def on_trash(self):
+		# Leaves a tombstone for everyone who could see this complaint.
+		complain_sync.record_doc_change(self)
+
+
+	
 
-	
\ No newline at end of file
+def on_doctype_update():
+	# get_complains pages a technician's complaints by state, newest first.
+	frappe.db.add_index("Complain", ["assigned_to_technician", "workflow_state", "creation"])
+	# Duplicate-phone warning and search_complains phone prefix lookups.
+	frappe.db.add_index("Complain", ["complainer_phone_normalized", "creation"])
+	frappe.db.add_index("Complain", ["territory", "creation"])
+
+	# search_complains matches words in the customer's name and address.
+	if not frappe.db.has_index("tabComplain", COMPLAINER_FULLTEXT_INDEX):
+		frappe.db.sql_ddl(
+			f"ALTER TABLE `tabComplain` ADD FULLTEXT INDEX `{COMPLAINER_FULLTEXT_INDEX}` (complainer_name, complainer_address)"
+		)
@@ -39,10 +39,9 @@ frappe.listview_settings['Complain'] = {
                         },
                         freeze: true,
                         callback: function (r) {
-                            if (!r.exc) {
-                                frappe.msgprint(__("Complaints assigned successfully."));
-                                listview.refresh();
+                            if (!r.exc && r.message && r.message.success) {
                                 d.hide();
+                                track_bulk_assign(listview, r.message.data.job_id);
                             }
                         }
                     });
@@ -52,3 +51,22 @@ frappe.listview_settings['Complain'] = {
         });
     }
 };
+
+function track_bulk_assign(listview, job_id) {
+    const event = "complain_bulk_assign_progress";
+    const handler = (data) => {
+        if (data.job_id !== job_id) return;
+
+        frappe.show_progress(__("Bulk Assign"), data.done, data.total, __("Assigning complaints..."));
+        if (!data.finished) return;
+
+        frappe.hide_progress();
+        frappe.realtime.off(event, handler);
+        let msg = __("{0} complaints assigned.", [data.assigned]);
+        if (data.skipped) msg += " " + __("{0} were no longer Open.", [data.skipped]);
+        if (data.failed) msg += " " + __("{0} failed (check Error Log).", [data.failed]);
+        frappe.msgprint(msg);
+        listview.refresh();
+    };
+    frappe.realtime.on(event, handler);
+}
@@ -195,6 +195,165 @@ class TestComplain(unittest.TestCase):
         
         self.assertIn("Currency Incentive Skipped: Daily limit reached", msg)
 
+    def test_sync_log_records_pool_and_assignee(self):
+        """Saving a complaint feeds sync_complains for the pool and the assignee."""
+        from hanif_traders.api import complain_sync
+
+        token = complain_sync.get_latest_token()
+        complain = frappe.get_doc({
+            "doctype": "Complain",
+            "complainer_name": "Sync Test",
+            "complainer_phone": "+92-300-1234567",
+            "complainer_address": "Test Address",
+            "date": today(),
+            "posting_time": "10:00:00",
+            "workflow_state": "Open"
+        }).insert(ignore_permissions=True)
+
+        complain.assigned_to_technician = self.technician_doc.name
+        complain.workflow_state = "Assigned"
+        complain.save()
+
+        # Rows younger than the safety lag are held back: their transaction may still be open.
+        names, _, _ = complain_sync.get_changes(self.technician_doc.name, token)
+        self.assertNotIn(complain.name, names)
+
+        with patch.object(complain_sync, "SAFETY_LAG_SECONDS", 0):
+            names, last_token, has_more = complain_sync.get_changes(self.technician_doc.name, token)
+            self.assertIn(complain.name, names)
+            self.assertFalse(has_more)
+            self.assertGreater(last_token, token)
+
+            # Sandbox technicians skip Open pool rows; this one is assigned, so still listed.
+            names, _, _ = complain_sync.get_changes(self.technician_doc.name, token, include_pool=False)
+            self.assertIn(complain.name, names)
+
+    def test_phone_normalized_across_formats(self):
+        """Differently formatted numbers share one normalized phone."""
+        first = self._create_complain("Phone Test 1")
+        second = frappe.get_doc({
+            "doctype": "Complain",
+            "complainer_name": "Phone Test 2",
+            "complainer_phone": "03001234567",
+            "complainer_address": "Test Address",
+            "date": today(),
+            "posting_time": "10:00:00",
+            "workflow_state": "Open"
+        }).insert(ignore_permissions=True)
+
+        self.assertEqual(first.complainer_phone_normalized, "03001234567")
+        self.assertEqual(second.complainer_phone_normalized, first.complainer_phone_normalized)
+
+    def test_search_by_phone_fragment(self):
+        """search_complains matches a phone prefix typed in any format."""
+        from hanif_traders.api.complain import search_complains
+
+        complain = self._create_complain("Search Test")
+        for fragment in ("+92-300-123", "0300123", "300123"):
+            response = search_complains(phone=fragment)
+            self.assertIn(complain.name, [row.name for row in response["data"]])
+
+    def test_resolution_writes_all_fields(self):
+        """Resolving sets state, status, resolution date and time in one write."""
+        from hanif_traders.api.complain import mark_resolved_without_csc
+
+        complain = self._create_complain("Resolution Test")
+        mark_resolved_without_csc(complain.name)
+
+        row = frappe.db.get_value(
+            "Complain", complain.name,
+            ["workflow_state", "status", "resolution_date", "time_to_resolution"], as_dict=True
+        )
+        self.assertEqual(row.workflow_state, "Resolved")
+        self.assertEqual(row.status, "Resolved")
+        self.assertEqual(str(row.resolution_date), today())
+        self.assertGreaterEqual(row.time_to_resolution, 0)
+
+    def test_state_counts_cached_and_invalidated_after_commit(self):
+        """Counts come from the cache and are refreshed once the write commits."""
+        from hanif_traders.api import complain_cache
+
+        technician = self.technician_doc.name
+        key = f"{complain_cache.STATE_COUNTS_KEY}:{technician}"
+        frappe.cache().delete_value(key)
+        before = complain_cache.get_state_counts(technician)
+        self.assertEqual(frappe.cache().get_value(key), before)
+
+        self._create_complain("Count Test")
+        # Still the cached counts: the key is only dropped after commit.
+        self.assertEqual(complain_cache.get_state_counts(technician), before)
+
+        frappe.db.after_commit.run()
+        after = complain_cache.get_state_counts(technician)
+        self.assertEqual(after.get("Assigned", 0), before.get("Assigned", 0) + 1)
+
+        from hanif_traders.api.complain import get_complain_count
+
+        with patch("hanif_traders.api.complain._resolve_technician", return_value=(technician, False)):
+            self.assertEqual(get_complain_count(states="Assigned")["data"], {"Assigned": after["Assigned"]})
+            self.assertEqual(get_complain_count(states='["Assigned"')["code"], "VALIDATION_ERROR")
+
+    def test_bulk_assign_assigns_open_and_queues_sms(self):
+        """run_bulk_assign takes only Open complaints; notifications queue one SMS each."""
+        from hanif_traders.api.complain import run_bulk_assign, send_assignment_notifications
+
+        settings = frappe.get_single("Complain Settings")
+        settings.sms_enabled = 1
+        settings.assigned_sms_template = "Your code is {{ csc_code }}"
+        settings.save()
+
+        open_names = [
+            frappe.get_doc({
+                "doctype": "Complain",
+                "complainer_name": f"Bulk Test {i}",
+                "complainer_phone": "+92-300-1234567",
+                "complainer_address": "Test Address",
+                "date": today(),
+                "posting_time": "10:00:00",
+                "workflow_state": "Open"
+            }).insert(ignore_permissions=True).name
+            for i in range(2)
+        ]
+        already_assigned = self._create_complain("Bulk Test Assigned").name
+
+        with patch("frappe.enqueue"):
+            progress = run_bulk_assign([*open_names, already_assigned], self.technician_doc.name, "Administrator")
+        self.assertEqual((progress["assigned"], progress["skipped"], progress["failed"]), (2, 1, 0))
+        for name in open_names:
+            row = frappe.db.get_value("Complain", name, ["workflow_state", "status", "assigned_to_technician"], as_dict=True)
+            self.assertEqual((row.workflow_state, row.status), ("Assigned", "Assigned"))
+            self.assertEqual(row.assigned_to_technician, self.technician_doc.name)
+
+        send_assignment_notifications(open_names)
+        for name in open_names:
+            self.assertTrue(frappe.db.get_value("Complain", name, "complain_csc"))
+            self.assertEqual(frappe.db.count("SMS Queue", {"reference_name": name}), 1)
+
+    def test_get_complains_cursor_ties_and_inserts(self):
+        """Keyset pages break creation ties by name and do not shift when newer rows arrive."""
+        from hanif_traders.api import complain as complain_api
+
+        def create(name, creation):
+            doc = self._create_complain(name)
+            frappe.db.sql("UPDATE `tabComplain` SET creation = %s WHERE name = %s", (creation, doc.name))
+            return doc.name
+
+        # Far-future creation keeps these ahead of any other Assigned rows.
+        tied = sorted([create("Cursor Test 1", "2099-01-01 00:00:00"), create("Cursor Test 2", "2099-01-01 00:00:00")], reverse=True)
+        older = create("Cursor Test 3", "2098-12-31 00:00:00")
+
+        with patch.object(complain_api, "_resolve_technician", return_value=(self.technician_doc.name, False)):
+            first = complain_api.get_complains(status="Assigned", fields="name", limit=1)
+            self.assertEqual([row.name for row in first["data"]], tied[:1])
+
+            # A newer complaint arriving between pages must not repeat or skip rows.
+            create("Cursor Test New", "2099-06-01 00:00:00")
+            second = complain_api.get_complains(status="Assigned", fields="name", cursor=first["meta"]["next_cursor"], limit=2)
+            self.assertEqual([row.name for row in second["data"]], [tied[1], older])
+
+            for fields in ('["name"', "[1]"):
+                self.assertEqual(complain_api.get_complains(status="Assigned", fields=fields)["code"], "VALIDATION_ERROR")
+
     def _create_complain(self, name):
         return frappe.get_doc({
             "doctype": "Complain",
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Salman and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class ComplainSyncLog(Document):
+	pass
+
+
+def on_doctype_update():
+	# sync_complains reads one technician's changes after a token.
+	frappe.db.add_index("Complain Sync Log", ["technician", "name"])
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Salman and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LocationHeatmapCell(Document):
+	pass
+
+
+def on_doctype_update():
+	# get_heatmap reads a date range inside a bounding box.
+	frappe.db.add_index("Location Heatmap Cell", ["date", "latitude", "longitude"])
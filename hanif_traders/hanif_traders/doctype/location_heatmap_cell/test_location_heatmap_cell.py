@@ -0,0 +1,84 @@
+# Copyright (c) 2026, Salman and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime
+
+from hanif_traders.api.geo import geohash_encode
+from hanif_traders.api.location_heatmap import CELL_PRECISION, rollup_day
+from hanif_traders.hanif_traders.doctype.technician_location_log.test_technician_location_log import (
+	_insert_log_rows,
+)
+
+DATE = "2002-03-05"
+
+
+class TestLocationHeatmapCell(FrappeTestCase):
+	def setUp(self):
+		suffix = frappe.generate_hash(length=6)
+		self.technicians = [f"TEST-HEATMAP-A-{suffix}", f"TEST-HEATMAP-B-{suffix}"]
+		# rollup_day commits, so the rows have to be removed explicitly.
+		self.addCleanup(self.delete_rows)
+
+		start = get_datetime(f"{DATE} 10:00:00")
+		_insert_log_rows(self.technicians[0], [(start, 24.86), (add_to_date(start, minutes=1), 24.86), (add_to_date(start, minutes=2), 24.87)])
+		_insert_log_rows(self.technicians[1], [(start, 24.86)])
+		now = frappe.utils.now_datetime()
+		frappe.db.bulk_insert(
+			"Technician Dwell",
+			("name", "creation", "modified", "owner", "modified_by", "docstatus",
+				"technician", "date", "latitude", "longitude", "duration_seconds", "is_open"),
+			[(frappe.generate_hash(length=10), now, now, "Administrator", "Administrator", 0,
+				self.technicians[0], DATE, 24.86, 67.0, 600, 0)],
+		)
+
+	def delete_rows(self):
+		frappe.db.delete("Technician Location Log", {"technician": ["in", self.technicians]})
+		frappe.db.delete("Technician Dwell", {"technician": ["in", self.technicians]})
+		frappe.db.delete("Location Heatmap Cell", {"date": DATE})
+		frappe.db.commit()
+
+	def test_rollup_day_is_idempotent(self):
+		self.assertTrue(frappe.db.has_index("tabLocation Heatmap Cell", "date_latitude_longitude_index"))
+
+		for _run in range(2):
+			self.assertEqual(rollup_day(DATE), 2)
+			cells = {
+				cell.geohash: cell
+				for cell in frappe.get_all(
+					"Location Heatmap Cell",
+					filters={"date": DATE},
+					fields=["geohash", "point_count", "technician_count", "dwell_seconds"],
+				)
+			}
+			self.assertEqual(len(cells), 2)
+
+			busy = cells[self.cell(24.86)]
+			self.assertEqual((busy.point_count, busy.technician_count, busy.dwell_seconds), (3, 2, 600))
+			quiet = cells[self.cell(24.87)]
+			self.assertEqual((quiet.point_count, quiet.technician_count, quiet.dwell_seconds), (1, 1, 0))
+
+	def test_get_heatmap_filters_bbox_and_dates(self):
+		from hanif_traders.api.location import get_heatmap
+
+		rollup_day(DATE)
+
+		response = get_heatmap(24.85, 66.99, 24.865, 67.01, DATE, DATE)
+		self.assertEqual([cell.geohash for cell in response["data"]], [self.cell(24.86)])
+		self.assertEqual(response["data"][0].point_count, 3)
+
+		response = get_heatmap(24.85, 66.99, 24.88, 67.01, DATE, DATE)
+		self.assertEqual(response["meta"]["count"], 2)
+		self.assertEqual(response["data"][0].geohash, self.cell(24.86))
+
+		response = get_heatmap(24.85, 66.99, 24.88, 67.01, "2002-03-06", "2002-03-07")
+		self.assertEqual(response["data"], [])
+		self.assertEqual(get_heatmap(24.85, 66.99, 24.88, 67.01, "2002-03-06", DATE)["code"], "VALIDATION_ERROR")
+
+		frappe.set_user("Guest")
+		self.addCleanup(frappe.set_user, "Administrator")
+		self.assertRaises(frappe.PermissionError, get_heatmap, 24.85, 66.99, 24.88, 67.01, DATE, DATE)
+
+	def cell(self, latitude):
+		return geohash_encode(latitude, 67.0, CELL_PRECISION)
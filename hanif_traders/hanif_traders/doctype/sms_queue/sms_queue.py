@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Salman and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class SMSQueue(Document):
+	pass
+
+
+def on_doctype_update():
+	# The worker picks due messages in order.
+	frappe.db.add_index("SMS Queue", ["status", "next_attempt_at"])
@@ -0,0 +1,59 @@
+# Copyright (c) 2026, Salman and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from hanif_traders.api import sms_queue
+from hanif_traders.api.utils import send_sms
+
+
+class TestSMSQueue(FrappeTestCase):
+	def setUp(self):
+		settings = frappe.get_single("Complain Settings")
+		settings.sms_gateway = "Local Stub"
+		settings.sms_max_retries = 1
+		settings.save()
+		frappe.db.delete("SMS Queue")
+
+	def test_queued_message_is_sent_by_worker(self):
+		send_sms(["03001234567", "03007654321"], "Your complaint is assigned", "Complain", "TEST-SMS-1")
+		self.assertEqual(frappe.db.count("SMS Queue", {"status": "Queued"}), 2)
+
+		sms_queue.flush_sms_queue()
+		self.assertEqual(frappe.db.count("SMS Queue", {"status": "Sent"}), 2)
+
+	def test_failed_message_backs_off_then_fails(self):
+		def failing_gateway(receivers, message):
+			raise Exception("Gateway down")
+
+		send_sms(["03001234567"], "Retry me")
+		with patch.dict(sms_queue.GATEWAYS, {"Local Stub": failing_gateway}):
+			sms_queue.flush_sms_queue()
+			row = frappe.get_all("SMS Queue", fields=["status", "retry_count", "next_attempt_at", "last_error"])[0]
+			self.assertEqual(row.status, "Queued")
+			self.assertEqual(row.retry_count, 1)
+			self.assertIn("Gateway down", row.last_error)
+
+			# Due again: the retry budget is spent, so the message is given up.
+			frappe.db.set_value("SMS Queue", {"receiver": "03001234567"}, "next_attempt_at", frappe.utils.now_datetime())
+			sms_queue.flush_sms_queue()
+			self.assertEqual(frappe.db.get_value("SMS Queue", {"receiver": "03001234567"}, "status"), "Failed")
+
+	def test_bad_receiver_does_not_resend_others(self):
+		sent = []
+
+		def picky_gateway(receivers, message):
+			if "00000000000" in receivers:
+				raise Exception("Invalid number")
+			sent.extend(receivers)
+
+		send_sms(["03001234567", "00000000000"], "Same text for both")
+		with patch.dict(sms_queue.GATEWAYS, {"Local Stub": picky_gateway}):
+			sms_queue.flush_sms_queue()
+
+		self.assertEqual(sent, ["03001234567"])
+		self.assertEqual(frappe.db.get_value("SMS Queue", {"receiver": "03001234567"}, "status"), "Sent")
+		self.assertEqual(frappe.db.get_value("SMS Queue", {"receiver": "00000000000"}, "status"), "Queued")
@@ -4,6 +4,12 @@
 # import frappe
 from frappe.model.document import Document
 
+from hanif_traders.api.complain_cache import clear_user_technician_cache
+
 
 class Technician(Document):
-	pass
+	def on_update(self):
+		clear_user_technician_cache()
+
+	def on_trash(self):
+		clear_user_technician_cache()
@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Salman and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Technician Distance Summary", {
+// 	refresh(frm) {
+
+// 	},
+// });
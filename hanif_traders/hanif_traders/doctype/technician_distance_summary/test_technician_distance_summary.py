@@ -0,0 +1,39 @@
+# Copyright (c) 2026, Salman and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime
+
+from hanif_traders.api.location_summary import summarize
+
+
+class TestTechnicianDistanceSummary(FrappeTestCase):
+	def test_summarize_distance_and_moving_time(self):
+		start = get_datetime("2026-10-18 10:00:00")
+		points = [
+			frappe._dict(latitude=24.86 + i * 0.001, longitude=67.0, captured_at=add_to_date(start, seconds=i * 30))
+			for i in range(5)
+		]
+		distance, moving = summarize(points)
+		# 4 segments of ~111 m each, all above walking pace
+		self.assertAlmostEqual(distance, 444.8, places=0)
+		self.assertEqual(moving, 120)
+
+	def test_summarize_continues_from_previous_point(self):
+		start = get_datetime("2026-10-18 10:00:00")
+		previous = frappe._dict(latitude=24.86, longitude=67.0, captured_at=start)
+		points = [frappe._dict(latitude=24.86, longitude=67.0, captured_at=add_to_date(start, seconds=60))]
+		distance, moving = summarize(points, previous)
+		# Stationary: no distance and no moving time
+		self.assertEqual(distance, 0)
+		self.assertEqual(moving, 0)
+
+	def test_distance_summary_needs_read_permission(self):
+		from hanif_traders.api.location import get_distance_summary
+
+		self.assertTrue(get_distance_summary(period="week")["success"])
+
+		frappe.set_user("Guest")
+		self.addCleanup(frappe.set_user, "Administrator")
+		self.assertRaises(frappe.PermissionError, get_distance_summary)
@@ -0,0 +1,15 @@
+# Copyright (c) 2026, Salman and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class TechnicianDwell(Document):
+	pass
+
+
+def on_doctype_update():
+	# Dwells are listed per technician in time order and swept while open.
+	frappe.db.add_index("Technician Dwell", ["technician", "start_time"])
+	frappe.db.add_index("Technician Dwell", ["is_open", "end_time"])
@@ -0,0 +1,42 @@
+# Copyright (c) 2026, Salman and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime
+
+from hanif_traders.api.location_dwell import MIN_DWELL_SECONDS, fold
+
+
+class TestTechnicianDwell(FrappeTestCase):
+	def test_fold_detects_stop_between_drives(self):
+		start = get_datetime("2026-10-18 10:00:00")
+
+		def point(minute, latitude, speed):
+			return frappe._dict(
+				technician="TECH-1",
+				employee_checkin="CHK-1",
+				latitude=latitude,
+				longitude=67.0,
+				speed=speed,
+				captured_at=add_to_date(start, minutes=minute),
+			)
+
+		# Driving, then ten minutes parked with GPS jitter, then driving off.
+		points = [point(0, 24.80, 12), point(1, 24.85, 12)]
+		points += [point(2 + i, 24.86 + (i % 2) * 0.0001, 0.2) for i in range(11)]
+		points += [point(14, 24.90, 12)]
+
+		state, closed_dwells = None, []
+		for p in points:
+			state, closed = fold(state, p)
+			if closed:
+				closed_dwells.append(closed)
+
+		self.assertEqual(len(closed_dwells), 1)
+		dwell = closed_dwells[0]
+		self.assertEqual(dwell.start, add_to_date(start, minutes=2))
+		self.assertEqual(dwell.end, add_to_date(start, minutes=12))
+		self.assertGreaterEqual(dwell.duration, MIN_DWELL_SECONDS)
+		self.assertEqual(dwell.point_count, 11)
+		self.assertAlmostEqual(dwell.latitude, 24.86005, places=4)
@@ -0,0 +1,52 @@
+# Copyright (c) 2026, Salman and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from hanif_traders.api.geo import geohash_encode
+
+
+class TestTechnicianLatestLocation(FrappeTestCase):
+	def test_nearest_technicians_widen_search(self):
+		from hanif_traders.api import location
+
+		suffix = frappe.generate_hash(length=6)
+		near, far, off_duty = (f"TEST-NEAREST-{label}-{suffix}" for label in ("NEAR", "FAR", "OFF"))
+		# ~110 m and ~4.4 km north of the search point; the far one is outside the first 3x3 block.
+		_insert_latest_locations([(near, 24.861, f"CI-NEAR-{suffix}"), (far, 24.9, f"CI-FAR-{suffix}"), (off_duty, 24.8601, None)])
+		active = {"EMP-NEAR": f"CI-NEAR-{suffix}", "EMP-FAR": f"CI-FAR-{suffix}"}
+
+		with patch.object(location, "_get_active_checkin_map", return_value=active):
+			response = location.get_nearest_technicians(24.86, 67.0, k=2)
+			self.assertTrue(response["success"])
+			self.assertEqual([row.technician for row in response["data"]], [near, far])
+			self.assertAlmostEqual(response["data"][0].distance_km, 0.111, places=2)
+
+			response = location.get_nearest_technicians(24.86, 67.0, k=1)
+			self.assertEqual([row.technician for row in response["data"]], [near])
+
+		with patch.object(location, "_get_active_checkin_map", return_value={}):
+			self.assertEqual(location.get_nearest_technicians(24.86, 67.0)["data"], [])
+
+		response = location.get_nearest_technicians("north", 67.0)
+		self.assertEqual(response["code"], "VALIDATION_ERROR")
+
+
+def _insert_latest_locations(positions):
+	"""
+	Bulk insert latest-position rows of (technician, latitude, employee_checkin) at longitude 67.
+	"""
+	fields = (
+		"name", "creation", "modified", "owner", "modified_by", "docstatus",
+		"technician", "employee_checkin", "latitude", "longitude", "geohash", "captured_at",
+	)
+	now = frappe.utils.now_datetime()
+	rows = [
+		(technician, now, now, "Administrator", "Administrator", 0,
+			technician, checkin, latitude, 67.0, geohash_encode(latitude, 67.0), now)
+		for technician, latitude, checkin in positions
+	]
+	frappe.db.bulk_insert("Technician Latest Location", fields, rows)
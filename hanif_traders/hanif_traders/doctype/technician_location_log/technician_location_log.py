@@ -6,3 +6,12 @@ from frappe.model.document import Document
 
 class TechnicianLocationLog(Document):
 	pass
+
+
+def on_doctype_update():
+	# Route and summary reads scan one technician's points in time order.
+	frappe.db.add_index("Technician Location Log", ["technician", "captured_at"])
+	# Readers that skip outliers (is_valid = 0) page through this one.
+	frappe.db.add_index("Technician Location Log", ["technician", "is_valid", "captured_at"])
+	# Compaction and retention work on whole days across all technicians.
+	frappe.db.add_index("Technician Location Log", ["captured_at"])
@@ -1,9 +1,431 @@
 # Copyright (c) 2026, Salman and Contributors
 # See license.txt
 
-# import frappe
+from unittest.mock import patch
+
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime
+
+from hanif_traders.api.geo import (
+	decode_polyline,
+	encode_polyline,
+	geohash_encode,
+	geohash_neighbours,
+	haversine,
+	simplify,
+)
+from hanif_traders.api.location_codec import decode_payload, encode_payload
+from hanif_traders.api.location_filter import check_point, coalesce_points, remember_kept
+from hanif_traders.api.location_metrics import summarize_window
+from hanif_traders.api.location_sampling import get_sampling_settings, recommend_interval
 
 
 class TestTechnicianLocationLog(FrappeTestCase):
-	pass
+	def test_polyline_round_trip(self):
+		coordinates = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+		encoded = encode_polyline(coordinates)
+		self.assertEqual(encoded, "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+		self.assertEqual(decode_polyline(encoded), coordinates)
+
+	def test_simplify_drops_collinear_points(self):
+		points = [{"latitude": 24.86 + i * 0.00001, "longitude": 67.0} for i in range(100)]
+		simplified = simplify(points, 1)
+		self.assertEqual(simplified, [points[0], points[-1]])
+
+	def test_simplify_keeps_corners(self):
+		points = [
+			{"latitude": 24.86, "longitude": 67.0},
+			{"latitude": 24.87, "longitude": 67.0},
+			{"latitude": 24.87, "longitude": 67.01},
+		]
+		self.assertEqual(simplify(points, 5), points)
+
+	def test_haversine(self):
+		# 0.01 degree of latitude is ~1.11 km
+		self.assertAlmostEqual(haversine(24.86, 67.0, 24.87, 67.0), 1111.95, places=1)
+
+	def test_outlier_filter(self):
+		settings = frappe._dict(max_accuracy=100, max_speed=45)
+		start = get_datetime("2026-10-18 10:00:00")
+		last = frappe._dict(latitude=24.86, longitude=67.0, captured_at=start)
+
+		def point(seconds, latitude=24.86, accuracy=10):
+			return frappe._dict(
+				latitude=latitude, longitude=67.0, accuracy=accuracy, captured_at=add_to_date(start, seconds=seconds)
+			)
+
+		self.assertIsNone(check_point(point(30, 24.861), last, settings))
+		self.assertEqual(check_point(point(30, accuracy=0), last, settings), "zero_accuracy")
+		self.assertEqual(check_point(point(30, accuracy=500), last, settings), "low_accuracy")
+		self.assertEqual(check_point(point(0), last, settings), "duplicate_timestamp")
+		# ~11 km in 30 seconds
+		self.assertEqual(check_point(point(30, 24.96), last, settings), "implied_speed")
+
+	def test_accuracy_rules(self):
+		settings = frappe._dict(max_accuracy=100, max_speed=45)
+		point = frappe._dict(latitude=24.86, longitude=67.0, captured_at=get_datetime("2026-10-18 10:00:00"))
+
+		# Unreported accuracy is accepted; the limit itself is still good enough.
+		self.assertIsNone(check_point(frappe._dict(point, accuracy=None), None, settings))
+		self.assertIsNone(check_point(frappe._dict(point, accuracy=100), None, settings))
+		self.assertEqual(check_point(frappe._dict(point, accuracy=100.5), None, settings), "low_accuracy")
+		self.assertEqual(check_point(frappe._dict(point, accuracy=-1), None, settings), "zero_accuracy")
+
+	def test_coalescing_waits_for_store(self):
+		from hanif_traders.api import location_filter
+
+		settings = frappe._dict(location_filter.get_filter_settings(), coalesce_window=30, coalesce_distance=10)
+		patcher = patch.object(location_filter, "get_filter_settings", return_value=settings)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+		technician = f"TEST-COALESCE-{frappe.generate_hash(length=6)}"
+		start = get_datetime("2026-10-18 10:00:00")
+
+		def point(seconds, latitude=24.86, device_id="DEV-1"):
+			return frappe._dict(
+				latitude=latitude, longitude=67.0, device_id=device_id, captured_at=add_to_date(start, seconds=seconds)
+			)
+
+		# Within one request: a nearby fix 5 s later is dropped, a distant one and another device are kept.
+		kept, dropped = coalesce_points(technician, [point(0), point(5), point(10, 24.87), point(5, device_id="DEV-2")])
+		self.assertEqual(len(kept), 3)
+		self.assertEqual([p.captured_at for p in dropped], [add_to_date(start, seconds=5)])
+
+		# Until the store succeeds a retry of the same fix is kept, not acknowledged as coalesced.
+		kept, dropped = coalesce_points(technician, [point(0)])
+		self.assertEqual((len(kept), len(dropped)), (1, 0))
+
+		remember_kept(technician, kept)
+		kept, dropped = coalesce_points(technician, [point(0)])
+		self.assertEqual((len(kept), len(dropped)), (0, 1))
+		# Outside the window the same position is kept again.
+		kept, dropped = coalesce_points(technician, [point(60)])
+		self.assertEqual(len(kept), 1)
+
+	def test_route_pages_with_cursor(self):
+		from hanif_traders.api.location import get_route
+
+		technician = f"TEST-ROUTE-{frappe.generate_hash(length=6)}"
+		start = get_datetime("2026-10-18 10:00:00")
+		_insert_log_rows(technician, [(add_to_date(start, seconds=i // 2 * 30), 24.86 + i * 0.001) for i in range(7)])
+
+		# Pairs of points share a timestamp; the cursor's name tie-break must not skip or repeat them.
+		latitudes, cursor = [], None
+		while True:
+			response = get_route(technician, date="2026-10-18", cursor=cursor, limit=2)
+			self.assertTrue(response["success"])
+			latitudes += [p.latitude for p in response["data"]]
+			cursor = response["meta"]["next_cursor"]
+			if not cursor:
+				break
+		self.assertEqual([round(v, 6) for v in sorted(latitudes)], [round(24.86 + i * 0.001, 6) for i in range(7)])
+
+		response = get_route(technician, date="2026-10-18", limit=3, format="polyline")
+		self.assertEqual(len(decode_polyline(response["data"]["polyline"])), 3)
+		self.assertTrue(response["meta"]["next_cursor"])
+
+		response = get_route(technician, employee_checkin="NO-SUCH-CHECKIN")
+		self.assertEqual(response["code"], "NOT_FOUND")
+
+		frappe.set_user("Guest")
+		self.addCleanup(frappe.set_user, "Administrator")
+		self.assertRaises(frappe.PermissionError, get_route, technician, date="2026-10-18")
+
+	def test_ingest_batch_partial_rejects_in_one_insert(self):
+		from hanif_traders.api import location
+
+		technician = f"TEST-BATCH-{frappe.generate_hash(length=6)}"
+		context = frappe._dict(
+			employee=None, technician=technician, technician_name="Batch Test", employee_checkin=None
+		)
+		points = [
+			{"latitude": 24.86, "longitude": 67.0, "captured_at": "2026-10-18 10:00:00", "accuracy": 8},
+			{"latitude": "north", "longitude": 67.0},
+			"not a point",
+			{"latitude": 95, "longitude": 67.0},
+			{"latitude": 24.87, "longitude": 67.0, "captured_at": "2026-10-18 10:05:00", "accuracy": 8},
+		]
+
+		with (
+			patch.object(location, "_resolve_ingest_context", return_value=(context, None)),
+			patch.object(frappe.db, "bulk_insert", wraps=frappe.db.bulk_insert) as bulk_insert,
+		):
+			response = location.ingest_batch(points=points)
+
+		self.assertTrue(response["success"])
+		self.assertEqual([r["success"] for r in response["data"]], [True, False, False, False, True])
+		self.assertEqual((response["meta"]["accepted"], response["meta"]["rejected"]), (2, 3))
+		inserts = [c for c in bulk_insert.call_args_list if c.args[0] == "Technician Location Log"]
+		self.assertEqual(len(inserts), 1)
+		self.assertEqual(frappe.db.count("Technician Location Log", {"technician": technician}), 2)
+
+	def test_derived_updates_fold_per_technician(self):
+		from hanif_traders.api import location
+
+		technician = f"TEST-DERIVED-{frappe.generate_hash(length=6)}"
+		cache = frappe.cache()
+		pending = f"{location.DERIVED_PENDING_KEY}:{technician}"
+		lock_key = cache.make_key(f"{location.DERIVED_LOCK_KEY}:{technician}")
+		self.addCleanup(cache.delete, cache.make_key(pending), lock_key)
+
+		with patch.object(frappe, "enqueue") as enqueue:
+			location._enqueue_derived_updates({technician: ["LOG-1"]})
+			location._enqueue_derived_updates({technician: ["LOG-2", "LOG-3"]})
+		self.assertEqual(enqueue.call_count, 2)
+		self.assertEqual(cache.llen(pending), 3)
+
+		with patch.object(location, "update_derived") as update_derived:
+			# While another job holds the lock, this one leaves the rows to it.
+			cache.set(lock_key, 1)
+			location.update_derived_for_technician(technician)
+			update_derived.assert_not_called()
+			self.assertEqual(cache.llen(pending), 3)
+
+			cache.delete(lock_key)
+			location.update_derived_for_technician(technician)
+		update_derived.assert_called_once_with(names=["LOG-1", "LOG-2", "LOG-3"])
+		self.assertEqual(cache.llen(pending), 0)
+
+	def test_ingest_batch_size_cap(self):
+		from hanif_traders.api import location
+
+		points = [{"latitude": 24.86, "longitude": 67.0}] * (location.MAX_BATCH_SIZE + 1)
+		response = location.ingest_batch(points=points)
+		self.assertFalse(response["success"])
+		self.assertEqual(response["code"], "VALIDATION_ERROR")
+
+	def test_geohash(self):
+		self.assertEqual(geohash_encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+		neighbours = geohash_neighbours("tsm0")
+		self.assertEqual(len(neighbours), 8)
+		self.assertNotIn("tsm0", neighbours)
+		self.assertIn("tsm1", neighbours)
+
+	def test_compact_payload_round_trip(self):
+		points = [
+			{
+				"timestamp": 1760000000000 + i * 15000,
+				"latitude": 24.86 + i * 0.0001,
+				"longitude": 67.0 - i * 0.00013,
+				"accuracy": None if i == 0 else 8,
+				"speed": 1.5,
+				"heading": 270,
+			}
+			for i in range(50)
+		]
+		for compression in (None, "gzip"):
+			decoded = decode_payload(encode_payload(points, compression), compression)
+			self.assertEqual(len(decoded), 50)
+			self.assertAlmostEqual(decoded[-1]["latitude"], points[-1]["latitude"], places=6)
+			self.assertAlmostEqual(decoded[-1]["longitude"], points[-1]["longitude"], places=6)
+			self.assertIsNone(decoded[0]["accuracy"])
+			self.assertEqual(decoded[1]["speed"], 1.5)
+			self.assertEqual((decoded[1]["captured_at"] - decoded[0]["captured_at"]).total_seconds(), 15)
+
+	def test_recommended_interval(self):
+		settings = get_sampling_settings()
+		moving = frappe._dict(speed=10.0, accuracy=10.0)
+		parked = frappe._dict(speed=0.0, accuracy=10.0)
+
+		self.assertEqual(recommend_interval(parked), settings.max_interval)
+		self.assertEqual(recommend_interval(moving, stationary=True), settings.max_interval)
+		self.assertLess(recommend_interval(moving), settings.max_interval)
+		self.assertGreaterEqual(recommend_interval(moving), settings.min_interval)
+		self.assertGreater(recommend_interval(moving, battery_level=5), recommend_interval(moving, battery_level=90))
+
+	def test_ingest_stats_window(self):
+		from collections import Counter
+
+		totals = Counter({
+			"received": 600,
+			"requests": 60,
+			"rejected:low_accuracy": 30,
+			"lag:0": 90,
+			"lag:3": 10,
+			"latency:2": 60,
+			"latency_ms": 1200,
+		})
+		stats = summarize_window(totals, 5)
+		self.assertEqual(stats["points_per_second"], 2)
+		self.assertEqual(stats["reject_rate"], {"low_accuracy": 0.05})
+		self.assertEqual(stats["lag_seconds"]["p50"], 1)
+		self.assertEqual(stats["lag_seconds"]["p99"], 10)
+		self.assertEqual(stats["latency_ms"]["p90"], 25)
+		self.assertEqual(stats["latency_ms"]["mean"], 20)
+
+		# Invalid points never reach "received"; rates are over every point seen.
+		totals.update({"rejected:invalid_point": 400})
+		stats = summarize_window(totals, 5)
+		self.assertEqual(stats["reject_rate"], {"low_accuracy": 0.03, "invalid_point": 0.4})
+
+
+	def test_buffer_full_rate_limits_ingest(self):
+		from hanif_traders.api import location, location_buffer
+
+		settings = frappe._dict(enabled=True, flush_size=100, flush_interval=60, max_size=2)
+		patcher = patch.object(location_buffer, "get_buffer_settings", return_value=settings)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		frappe.cache().delete_value(location_buffer.BUFFER_KEY)
+		self.addCleanup(frappe.cache().delete_value, location_buffer.BUFFER_KEY)
+
+		technician = f"TEST-BUFFER-{frappe.generate_hash(length=6)}"
+		row = frappe._dict(technician=technician, latitude=24.86, longitude=67.0)
+		self.assertTrue(location_buffer.enqueue_rows([row, row]))
+		self.assertFalse(location_buffer.enqueue_rows([row]))
+		self.assertEqual(frappe.cache().llen(location_buffer.BUFFER_KEY), 2)
+
+		context = frappe._dict(
+			employee=None, technician=technician, technician_name="Buffer Test", employee_checkin=None
+		)
+		with patch.object(location, "_resolve_ingest_context", return_value=(context, None)):
+			response = location.ingest(latitude=24.87, longitude=67.0, accuracy=8)
+
+		self.assertFalse(response["success"])
+		self.assertEqual(response["code"], "RATE_LIMITED")
+		self.assertTrue(response["meta"]["next_interval"])
+		self.assertEqual(frappe.cache().llen(location_buffer.BUFFER_KEY), 2)
+
+	def test_buffer_writes_through_without_redis(self):
+		from redis.exceptions import ConnectionError as RedisConnectionError
+
+		from hanif_traders.api import location, location_buffer
+
+		settings = frappe._dict(enabled=True, flush_size=100, flush_interval=60, max_size=50000)
+		technician = f"TEST-NO-REDIS-{frappe.generate_hash(length=6)}"
+		context = frappe._dict(
+			employee=None, technician=technician, technician_name="No Redis Test", employee_checkin=None
+		)
+		with (
+			patch.object(location_buffer, "get_buffer_settings", return_value=settings),
+			patch.object(location, "_resolve_ingest_context", return_value=(context, None)),
+			patch.object(frappe.cache(), "llen", side_effect=RedisConnectionError),
+		):
+			response = location.ingest(latitude=24.86, longitude=67.0, accuracy=8)
+
+		# The point is acknowledged only once it is in the database, not held in worker memory.
+		self.assertTrue(response["success"])
+		self.assertEqual(frappe.db.count("Technician Location Log", {"technician": technician}), 1)
+
+	def test_failed_flush_is_dead_lettered(self):
+		import json
+
+		from hanif_traders.api import location_buffer
+
+		frappe.cache().delete_value(location_buffer.DEAD_LETTER_KEY)
+		self.addCleanup(frappe.cache().delete_value, location_buffer.DEAD_LETTER_KEY)
+
+		chunk = [json.dumps({"technician": "TEST-DEAD-LETTER", "captured_at": "2026-10-18 10:00:00"})] * 3
+		with patch("hanif_traders.api.location.write_log_rows", side_effect=frappe.DuplicateEntryError) as write:
+			location_buffer._write_chunk(chunk)
+
+		self.assertEqual(write.call_args.args[0][0].captured_at, get_datetime("2026-10-18 10:00:00"))
+		self.assertEqual(frappe.cache().llen(location_buffer.DEAD_LETTER_KEY), 3)
+
+	def test_route_export_writers(self):
+		import csv
+		import io
+		import json
+
+		from hanif_traders.api.location import iter_route_points
+		from hanif_traders.api.location_export import write_csv, write_geojson, write_gpx
+
+		technician = f"TEST-EXPORT-{frappe.generate_hash(length=6)}"
+		start = get_datetime("2026-10-18 10:00:00")
+		_insert_log_rows(technician, [(add_to_date(start, seconds=i * 30), 24.86 + i * 0.001) for i in range(3)])
+
+		def export(writer):
+			out = io.StringIO()
+			writer(out, technician, iter_route_points(technician, start, add_to_date(start, hours=1), page_size=2))
+			return out.getvalue()
+
+		rows = list(csv.reader(io.StringIO(export(write_csv))))
+		self.assertEqual(rows[0], ["technician", "captured_at", "latitude", "longitude", "speed", "heading"])
+		self.assertEqual(len(rows), 4)
+		self.assertEqual((rows[1][0], rows[1][1], rows[1][4]), (technician, "2026-10-18 10:00:00", ""))
+
+		features = json.loads(export(write_geojson))["features"]
+		self.assertEqual(len(features), 3)
+		self.assertEqual(features[2]["geometry"]["coordinates"], [67.0, 24.862])
+		self.assertIsNone(features[0]["properties"]["speed"])
+
+		with patch("hanif_traders.api.location_export.get_system_timezone", return_value="Asia/Karachi"):
+			gpx = export(write_gpx)
+		self.assertEqual(gpx.count("<trkpt "), 3)
+		# Stored times are Karachi wall time (UTC+5).
+		self.assertIn("<time>2026-10-18T05:00:30Z</time>", gpx)
+		self.assertIn(f"<name>{technician}</name>", gpx)
+
+	def test_month_history_archive(self):
+		import shutil
+
+		from hanif_traders.api.location_history import MonthHistory, export_month, get_history_path
+
+		month = "2001-02"
+		technician = f"TEST-HISTORY-{frappe.generate_hash(length=6)}"
+		start = get_datetime("2001-02-10 10:00:00")
+		_insert_log_rows(technician, [(add_to_date(start, seconds=i * 30), 24.86 + i * 0.001) for i in range(3)])
+
+		export_month(month)
+		self.addCleanup(shutil.rmtree, get_history_path(month), ignore_errors=True)
+
+		history = MonthHistory(month)
+		self.addCleanup(history.close)
+		self.assertIn(technician, history.technicians)
+
+		points = history.replay(technician, columns=("captured_at", "latitude", "speed"))
+		self.assertEqual([p.captured_at for p in points], [add_to_date(start, seconds=i * 30) for i in range(3)])
+		self.assertAlmostEqual(points[2].latitude, 24.862)
+		self.assertIsNone(points[0].speed)
+		self.assertNotIn("longitude", points[0])
+
+		points = history.replay(technician, from_time=add_to_date(start, seconds=30), to_time=add_to_date(start, seconds=30))
+		self.assertEqual(len(points), 1)
+		self.assertEqual(history.replay("NO-SUCH-TECHNICIAN"), [])
+
+		stats = next(row for row in history.fleet_stats() if row["technician"] == technician)
+		self.assertEqual(stats["point_count"], 3)
+		self.assertAlmostEqual(stats["distance_km"], 0.222, places=3)
+
+		from hanif_traders.api.location import get_history_fleet_stats, get_history_route
+
+		response = get_history_route(technician, month, columns="latitude,speed")
+		self.assertEqual(response["meta"]["count"], 3)
+		self.assertEqual(set(response["data"][0]), {"latitude", "speed"})
+		self.assertEqual(get_history_route(technician, month, columns='["latitude"')["code"], "VALIDATION_ERROR")
+		self.assertEqual(get_history_route(technician, month, columns="[1]")["code"], "VALIDATION_ERROR")
+
+		frappe.set_user("Guest")
+		self.addCleanup(frappe.set_user, "Administrator")
+		self.assertRaises(frappe.PermissionError, get_history_fleet_stats, month)
+
+
+def _insert_log_rows(technician, points):
+	"""
+	Bulk insert valid log rows of (captured_at, latitude) for `technician`, bypassing ingest.
+	"""
+	from hanif_traders.api.location import LOG_FIELDS
+
+	now = frappe.utils.now_datetime()
+	rows = []
+	for captured_at, latitude in points:
+		row = dict.fromkeys(LOG_FIELDS)
+		row.update(
+			name=frappe.generate_hash(length=10),
+			creation=now,
+			modified=now,
+			owner="Administrator",
+			modified_by="Administrator",
+			docstatus=0,
+			technician=technician,
+			latitude=latitude,
+			longitude=67.0,
+			geohash=geohash_encode(latitude, 67.0),
+			captured_at=captured_at,
+			received_at=now,
+			is_valid=1,
+		)
+		rows.append(tuple(row[field] for field in LOG_FIELDS))
+	frappe.db.bulk_insert("Technician Location Log", LOG_FIELDS, rows)
@@ -0,0 +1,35 @@
+# Copyright (c) 2026, Salman and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, get_datetime
+
+from hanif_traders.api.location_compaction import decode_archive, encode_points
+
+
+class TestTechnicianRouteArchive(FrappeTestCase):
+	def test_encode_decode_round_trip(self):
+		start = get_datetime("2026-10-18 09:00:00")
+		points = [
+			frappe._dict(
+				employee_checkin="CHK-1" if i < 3 else "CHK-2",
+				latitude=24.860001 + i * 0.0001,
+				longitude=67.000002 - i * 0.0001,
+				captured_at=add_to_date(start, seconds=i * 15),
+				speed=None if i == 0 else 1.5,
+				heading=90,
+				accuracy=8,
+			)
+			for i in range(5)
+		]
+		archive = frappe._dict(encode_points(points), name="TECH-2026-10-18")
+		decoded = decode_archive(archive)
+
+		self.assertEqual(len(decoded), 5)
+		for original, point in zip(points, decoded, strict=True):
+			self.assertAlmostEqual(point.latitude, original.latitude, places=6)
+			self.assertAlmostEqual(point.longitude, original.longitude, places=6)
+			self.assertEqual(point.captured_at, original.captured_at)
+			self.assertEqual(point.speed, original.speed)
+			self.assertEqual(point.employee_checkin, original.employee_checkin)
@@ -19,14 +19,29 @@ class TechnicianDashboard {
         this.wrapper = wrapper;
         this.page = page;
         this.body = $(this.wrapper).find('.layout-main-section');
+        this.marker_map = {};
         this.make_ui();
         this.setup_actions();
         this.refresh();
 
+        // Positions arrive as realtime deltas; the snapshot in refresh() catches
+        // up on throttled updates and technicians going off duty.
+        this.setup_realtime();
+
         // Auto refresh
         setInterval(() => this.refresh(), 60000);
     }
 
+    setup_realtime() {
+        frappe.realtime.doctype_subscribe("Technician Latest Location");
+        frappe.realtime.on("technician_location_update", (data) => {
+            if (data && data.positions) {
+                $('#map-message-overlay').hide();
+                this.apply_position_deltas(data.positions);
+            }
+        });
+    }
+
     setup_actions() {
         this.page.add_inner_button('Full Screen', () => {
             if (!document.fullscreenElement) {
@@ -142,8 +157,8 @@ class TechnicianDashboard {
 
     refresh() {
         this.fetch_stats();
-        this.fetch_locations();
         this.fetch_leaderboard();
+        this.fetch_locations();
     }
 
     fetch_stats() {
@@ -166,7 +181,7 @@ class TechnicianDashboard {
             method: "hanif_traders.api.location.get_latest_locations",
             args: { on_duty_only: 1 },
             callback: (r) => {
-                if (r.message && r.message.status === 'success' && r.message.data && r.message.data.length > 0) {
+                if (r.message && r.message.success && r.message.data && r.message.data.length > 0) {
                     $('#map-message-overlay').hide();
                     this.update_map(r.message.data);
                 } else {
@@ -175,7 +190,7 @@ class TechnicianDashboard {
                         method: "hanif_traders.api.location.get_latest_locations",
                         args: { on_duty_only: 0 },
                         callback: (r2) => {
-                            if (r2.message && r2.message.status === 'success' && r2.message.data && r2.message.data.length > 0) {
+                            if (r2.message && r2.message.success && r2.message.data && r2.message.data.length > 0) {
                                 $('#map-message-overlay').show();
                                 this.update_map(r2.message.data);
                             } else {
@@ -192,38 +207,64 @@ class TechnicianDashboard {
     update_map(locations) {
         if (!this.map) return;
         this.markers.clearLayers();
+        this.marker_map = {};
 
         if (locations.length > 0) {
             var bounds = [];
             locations.forEach(loc => {
-                var latlng = [loc.latitude, loc.longitude];
+                this.add_marker(loc);
+                bounds.push([loc.latitude, loc.longitude]);
+            });
 
-                var technician_icon = L.divIcon({
-                    className: 'technician-marker',
-                    html: '<div style="font-size:28px; filter: drop-shadow(0 2px 3px rgba(0,0,0,0.2));">🧑‍🔧</div>',
-                    iconSize: [30, 30],
-                    iconAnchor: [15, 15]
-                });
+            // Fit once; later snapshots must not reset the user's pan and zoom
+            if (!this.fitted) {
+                this.map.fitBounds(bounds, { padding: [50, 50] });
+                this.fitted = true;
+            }
+        }
+    }
 
-                var time_diff = this.get_time_diff(loc.captured_at);
+    apply_position_deltas(positions) {
+        if (!this.map) return;
 
-                var marker = L.marker(latlng, { icon: technician_icon }).bindTooltip(`
-                    <div style="text-align:center; line-height:1.2;">
-                        <strong style="font-size:1.05em; color:#374151; display:block; margin-bottom:2px;">${loc.technician_name}</strong>
-                        <span style="color:#6B7280; font-size:0.85em;">🕒 ${time_diff}</span>
-                    </div>
-                `, {
-                    permanent: true,
-                    direction: 'top',
-                    className: 'tech-tooltip-card',
-                    offset: [0, -15]
-                });
-                this.markers.addLayer(marker);
-                bounds.push(latlng);
-            });
+        positions.forEach(loc => {
+            var marker = this.marker_map[loc.technician];
+            if (marker) {
+                marker.setLatLng([loc.latitude, loc.longitude]);
+                marker.setTooltipContent(this.get_tooltip_html(loc));
+            } else {
+                this.add_marker(loc);
+            }
+        });
+    }
 
-            this.map.fitBounds(bounds, { padding: [50, 50] });
-        }
+    add_marker(loc) {
+        var technician_icon = L.divIcon({
+            className: 'technician-marker',
+            html: '<div style="font-size:28px; filter: drop-shadow(0 2px 3px rgba(0,0,0,0.2));">🧑‍🔧</div>',
+            iconSize: [30, 30],
+            iconAnchor: [15, 15]
+        });
+
+        var marker = L.marker([loc.latitude, loc.longitude], { icon: technician_icon }).bindTooltip(this.get_tooltip_html(loc), {
+            permanent: true,
+            direction: 'top',
+            className: 'tech-tooltip-card',
+            offset: [0, -15]
+        });
+        this.markers.addLayer(marker);
+        this.marker_map[loc.technician] = marker;
+    }
+
+    get_tooltip_html(loc) {
+        var time_diff = this.get_time_diff(loc.captured_at);
+
+        return `
+            <div style="text-align:center; line-height:1.2;">
+                <strong style="font-size:1.05em; color:#374151; display:block; margin-bottom:2px;">${loc.technician_name}</strong>
+                <span style="color:#6B7280; font-size:0.85em;">🕒 ${time_diff}</span>
+            </div>
+        `;
     }
 
     get_time_diff(captured_at) {
@@ -4,6 +4,8 @@
 import frappe
 from frappe import _
 
+from hanif_traders.api.utils import phone_search_prefix
+
 def execute(filters=None):
 	columns = get_columns()
 	data = get_data(filters)
@@ -63,7 +65,9 @@ def get_conditions(filters):
 	if filters.get("technician"):
 		conditions += " AND assigned_to_technician = %(technician)s"
 	if filters.get("complainer_phone"):
-		conditions += " AND complainer_phone LIKE %(complainer_phone)s"
+		# Prefix match on the indexed normalized number, whatever format was typed.
+		filters["phone_prefix"] = phone_search_prefix(filters.get("complainer_phone")) + "%"
+		conditions += " AND complainer_phone_normalized LIKE %(phone_prefix)s"
 	if filters.get("territory"):
 		conditions += " AND territory = %(territory)s"
 	if filters.get("workflow_state"):
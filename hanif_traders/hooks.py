@@ -205,21 +205,30 @@ doc_events = {
 # ---------------
 
 scheduler_events = {
-# 	"all": [
-# 		"hanif_traders.tasks.all"
-# 	],
+	"all": [
+		"hanif_traders.api.sms_queue.flush_sms_queue"
+	],
+	"cron": {
+		"* * * * *": [
+			"hanif_traders.api.location_buffer.flush_if_due"
+		]
+	},
 	"daily": [
-		"hanif_traders.api.employee.auto_checkout_employees"
+		"hanif_traders.api.employee.auto_checkout_employees",
+		"hanif_traders.api.location_summary.rebuild_closed_day",
+		"hanif_traders.api.location_compaction.compact_closed_days",
+		"hanif_traders.api.location_dwell.rebuild_closed_day",
+		"hanif_traders.api.complain_sync.purge_old_changes"
+	],
+	"hourly": [
+		"hanif_traders.api.location_dwell.close_stale_dwells"
 	],
-# 	"hourly": [
-# 		"hanif_traders.tasks.hourly"
-# 	],
 # 	"weekly": [
 # 		"hanif_traders.tasks.weekly"
 # 	],
-# 	"monthly": [
-# 		"hanif_traders.tasks.monthly"
-# 	],
+	"monthly": [
+		"hanif_traders.api.location_history.export_closed_month"
+	],
 }
 
 # Testing
@@ -0,0 +1,28 @@
+import frappe
+
+from hanif_traders.api.utils import normalize_phone
+
+BATCH_SIZE = 1000
+
+
+def execute():
+	"""Fill `complainer_phone_normalized` on existing complaints so the duplicate-phone check finds them."""
+	rows = frappe.db.sql(
+		"""
+		SELECT name, complainer_phone FROM `tabComplain`
+		WHERE complainer_phone_normalized IS NULL AND IFNULL(complainer_phone, '') != ''
+		""",
+		as_dict=True,
+	)
+	values = [(row.name, normalize_phone(row.complainer_phone)) for row in rows]
+	values = [(name, phone) for name, phone in values if phone]
+
+	for start in range(0, len(values), BATCH_SIZE):
+		batch = values[start:start + BATCH_SIZE]
+		frappe.db.sql(f"""
+			UPDATE `tabComplain`
+			SET complainer_phone_normalized = CASE name {" ".join(["WHEN %s THEN %s"] * len(batch))} END
+			WHERE name IN %s
+		""", [*(value for item in batch for value in item), tuple(name for name, _ in batch)])
+
+	frappe.db.commit()
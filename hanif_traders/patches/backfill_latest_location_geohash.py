@@ -0,0 +1,24 @@
+import frappe
+
+from hanif_traders.api.geo import geohash_encode
+from hanif_traders.api.location import GEOHASH_PRECISION
+
+
+def execute():
+	"""Fill the geohash of existing `Technician Latest Location` rows so nearest-technician lookups see them."""
+	rows = frappe.get_all(
+		"Technician Latest Location",
+		filters={"geohash": ["is", "not set"]},
+		fields=["name", "latitude", "longitude"],
+	)
+
+	for row in rows:
+		frappe.db.set_value(
+			"Technician Latest Location",
+			row.name,
+			"geohash",
+			geohash_encode(row.latitude, row.longitude, GEOHASH_PRECISION),
+			update_modified=False,
+		)
+
+	frappe.db.commit()
@@ -0,0 +1,24 @@
+import frappe
+
+
+def execute():
+	"""Seed `Technician Latest Location` with each technician's newest `Technician Location Log` row."""
+	frappe.db.sql(
+		"""
+		INSERT IGNORE INTO `tabTechnician Latest Location`
+			(name, creation, modified, owner, modified_by, docstatus,
+			technician, technician_name, employee, employee_checkin, device_id,
+			latitude, longitude, accuracy, speed, heading, captured_at, received_at, location_log)
+		SELECT
+			log.technician, NOW(6), NOW(6), 'Administrator', 'Administrator', 0,
+			log.technician, log.technician_name, log.employee, log.employee_checkin, log.device_id,
+			log.latitude, log.longitude, log.accuracy, log.speed, log.heading, log.captured_at, log.received_at, log.name
+		FROM (
+			SELECT *, ROW_NUMBER() OVER (PARTITION BY technician ORDER BY captured_at DESC) AS rn
+			FROM `tabTechnician Location Log`
+		) log
+		WHERE log.rn = 1
+		"""
+	)
+
+	frappe.db.commit()